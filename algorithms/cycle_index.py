@@ -0,0 +1,88 @@
+import algorithms.kidney_solver.kidney_digraph as kidney_digraph
+
+
+class CycleIndex:
+    """
+    Keeps the cycles of a kidney exchange market up to date between matching periods
+    Compatibilities between pairs never change while both pairs are in the market, so the cycles of
+    one period are the cycles of the previous period that survive, plus the cycles through new pairs
+    Cycles are stored as tuples of pair id_nums, with the lowest id_num first
+    Attributes
+    ----------
+    max_cycle: int
+        the cycle cap of the stored cycles, or None if no cycles have been enumerated yet
+    cycles: dict<tuple, None>
+        the stored cycles (a dict is used as an ordered set)
+    vtx_to_cycles: dict<int, set<tuple>>
+        for each id_num, the stored cycles through that pair
+    new_vertices: set<int>
+        the id_nums of the pairs added since the last enumeration
+    """
+
+    def __init__(self):
+        self.max_cycle = None
+        self.cycles = dict()
+        self.vtx_to_cycles = dict()
+        self.new_vertices = set()
+
+    def add_vertex(self, id_num):
+        """
+        records that a pair has entered the market
+        :param id_num: the id_num of the pair
+        """
+        self.new_vertices.add(id_num)
+
+    def remove_vertex(self, id_num):
+        """
+        records that a pair has left the market, and drops all the cycles through it
+        :param id_num: the id_num of the pair
+        """
+        self.new_vertices.discard(id_num)
+        for cycle in self.vtx_to_cycles.pop(id_num, ()):
+            self.cycles.pop(cycle, None)
+            for v in cycle:
+                if v != id_num:
+                    self.vtx_to_cycles[v].discard(cycle)
+
+    def get_cycles(self, digraph, max_cycle):
+        """
+        enumerates the cycles through the new pairs and returns all the cycles of the digraph
+        :param digraph: the Digraph of the current market, with vertices labelled by id_num
+        :param max_cycle: the cycle cap
+        :return: a list of cycles, each a list of Vertex objects of the digraph with the first vertex not repeated
+        """
+        if max_cycle != self.max_cycle:
+            self.max_cycle = max_cycle
+            self.cycles = dict()
+            self.vtx_to_cycles = dict()
+            self.new_vertices = set(v.label for v in digraph.vs if v is not None)
+
+        for cycle in self.find_new_cycles(digraph, max_cycle):
+            cycle = tuple(v.label for v in cycle)
+            min_index_pos = cycle.index(min(cycle))
+            cycle = cycle[min_index_pos:] + cycle[:min_index_pos]
+            self.cycles[cycle] = None
+            for v in cycle:
+                self.vtx_to_cycles.setdefault(v, set()).add(cycle)
+        self.new_vertices = set()
+
+        return [[digraph.get_vertex(v) for v in cycle] for cycle in self.cycles]
+
+    def find_new_cycles(self, digraph, max_length):
+        """
+        finds the cycles of length up to max_length that pass through at least one new pair
+        this is the search of Digraph.generate_cycles with the new pairs ordered before all the others,
+        and run only from new pairs, so each cycle is found from its lowest-ordered (new) pair
+        :return: a list of cycles, each a list of Vertex objects
+        """
+        vs = [v for v in digraph.vs if v is not None]
+        new_vs = [v for v in vs if v.label in self.new_vertices]
+        rank = [None] * len(digraph.vs)
+        for i, v in enumerate(new_vs + [v for v in vs if v.label not in self.new_vertices]):
+            rank[v.id] = i
+
+        out_adj_lists, in_adj_lists = digraph.int_adj_lists()
+        return [[digraph.vs[i] for i in cycle]
+                for low_vtx, cycles in kidney_digraph.generate_cycles_from_low_vertices(
+                    [v.id for v in new_vs], out_adj_lists, in_adj_lists, max_length, rank)
+                for cycle in cycles]
@@ -4,6 +4,12 @@ some related methods.
 """
 
 from collections import deque
+import logging
+import multiprocessing
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 class KidneyReadException(Exception):
     pass
@@ -32,10 +38,20 @@ def failure_aware_cycle_score(cycle, digraph, edge_success_prob):
                     for i in range(len(cycle))) * edge_success_prob**len(cycle)
 
 class Vertex:
-    """A vertex in a directed graph (see the Digraph class)."""
+    """A vertex in a directed graph (see the Digraph class).
+
+    Data members:
+        id: the index of the vertex in Digraph.vs
+        label: the id num of the pair that this vertex represents. This is
+            equal to id in a dense digraph; a sparse digraph remaps ids to the
+            range 0..n-1, and an induced subgraph renumbers its vertices but
+            keeps their labels
+        edges: a list of out-edges
+    """
 
-    def __init__(self, id):
+    def __init__(self, id, label=None):
         self.id = id
+        self.label = id if label is None else label
         self.edges = []
 
     def __str__(self):
@@ -53,29 +69,67 @@ class Edge:
     def __str__(self):
         return ("V" + str(self.src.id) + "-V" + str(self.tgt.id))
 
+class AdjacencyRow(dict):
+    """A row of the adjacency matrix of a sparse Digraph.
+
+    Only the edges that exist are stored, keyed by target vertex id. Looking up
+    a target with no edge returns None, as a row of the dense matrix would.
+    """
+
+    def __missing__(self, key):
+        return None
+
 class Digraph:
     """A directed graph, in which each edge has a numeric score.
 
     Data members:
         n: the number of vertices in the digraph
         max_n: the maximum id num of the vertices
+        sparse: True if and only if the pair id nums are remapped to the range
+            0..n-1 and adj_mat only stores existing edges
         vs: an array of Vertex objects, such that vs[i].id == i
         es: an array of Edge objects, such that es[i].id = i
+        adj_mat: adj_mat[i][j] is the Edge from vs[i] to vs[j], or None
     """
 
-    def __init__(self, n):
-        """Create a Digraph with n vertices"""
+    def __init__(self, n, sparse=False):
+        """Create a Digraph with a vertex for each id num in n
+
+        Args:
+            n: a list of the id nums of the vertices
+            sparse: if True, vertices are numbered 0..len(n)-1 in the order
+                given by n, with vs[i].label == n[i], and the adjacency matrix
+                is stored as one dict per vertex. Memory then grows with the
+                number of vertices and edges rather than with max(n).
+        """
         self.n = len(n)
         self.max_n = max(n)
-        print("n is: ")
-        print(n)
-        print("Max n is " + str(max(n)))
-        self.vs = [None for i in range(max(n) + 1)]
-        for i in n:
-            self.vs[i] = Vertex(i)
-        self.adj_mat = [[None for x in range(max(n) + 1)] for x in range(max(n) + 1)]
+        self.sparse = sparse
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("vertices: %s, max id_num: %s", n, self.max_n)
+        if sparse:
+            self.vs = [Vertex(i, label) for i, label in enumerate(n)]
+            self.label_to_vtx = {v.label: v for v in self.vs}
+            self.adj_mat = [AdjacencyRow() for v in self.vs]
+        else:
+            self.vs = [None for i in range(max(n) + 1)]
+            for i in n:
+                self.vs[i] = Vertex(i)
+            self.adj_mat = [[None for x in range(max(n) + 1)] for x in range(max(n) + 1)]
         self.es = []
 
+    def has_vertex(self, label):
+        """Returns true if and only if the digraph has a vertex for id num label."""
+        if self.sparse:
+            return label in self.label_to_vtx
+        return 0 <= label <= self.max_n and self.vs[label] is not None
+
+    def get_vertex(self, label):
+        """Returns the Vertex for id num label."""
+        if self.sparse:
+            return self.label_to_vtx[label]
+        return self.vs[label]
+
     def add_edge(self, score, source, tgt):
         """Add an edge to the digraph
 
@@ -91,16 +145,86 @@ class Digraph:
         source.edges.append(e)
         self.adj_mat[source.id][tgt.id] = e
     
-    def find_cycles(self, max_length):
+    def find_cycles(self, max_length, processes=1):
         """Find cycles of length up to max_length in the digraph.
 
+        Args:
+            max_length: the cycle cap
+            processes: the number of worker processes. If this is greater than
+                one, the searches from each low vertex are run in a process pool
+                (see find_cycles_parallel).
+
         Returns:
             a list of cycles. Each cycle is represented as a list of
             vertices, with the first vertex _not_ repeated at the end.
         """
         
+        if processes > 1:
+            return self.find_cycles_parallel(max_length, processes)
         return [cycle for cycle in self.generate_cycles(max_length)]
 
+    def int_adj_lists(self):
+        """Returns the out- and in-adjacency lists of the digraph as lists of
+        lists of vertex ids, with an empty list for each missing vertex id."""
+
+        out_adj_lists = [[] if v is None else [e.tgt.id for e in v.edges] for v in self.vs]
+        in_adj_lists = [[] for v in self.vs]
+        for edge in self.es:
+            in_adj_lists[edge.tgt.id].append(edge.src.id)
+        return out_adj_lists, in_adj_lists
+
+    def edge_arrays(self):
+        """Returns the source vertex ids, target vertex ids and scores of the
+        edges, as NumPy arrays indexed by edge id."""
+
+        src = np.fromiter((e.src.id for e in self.es), dtype=np.intp, count=len(self.es))
+        tgt = np.fromiter((e.tgt.id for e in self.es), dtype=np.intp, count=len(self.es))
+        scores = np.fromiter((e.score for e in self.es), dtype=float, count=len(self.es))
+        return src, tgt, scores
+
+    def find_cycles_parallel(self, max_length, processes):
+        """Find cycles of length up to max_length, using a pool of processes.
+
+        The search from each low vertex (see generate_cycles) is independent,
+        so low vertices are split into chunks that are searched by the workers.
+        The most expensive low vertices are handed out first, in chunks of
+        their own, and the workers take chunks as they become free. The cycles
+        are returned in the same order as by generate_cycles.
+        """
+
+        out_adj_lists, in_adj_lists = self.int_adj_lists()
+        low_vertices = [v.id for v in self.vs if v is not None]
+
+        # Estimate the work from each low vertex by the number of edges
+        # to and from higher vertices
+        work = {}
+        for v_id in low_vertices:
+            n_out = sum(1 for w in out_adj_lists[v_id] if w > v_id)
+            n_in = sum(1 for w in in_adj_lists[v_id] if w > v_id)
+            work[v_id] = n_out * n_in
+        chunk_work = max(1, sum(work.values()) // (processes * 8))
+        chunks = []
+        chunk = []
+        total = 0
+        for v_id in sorted(low_vertices, key=lambda v_id: work[v_id], reverse=True):
+            chunk.append(v_id)
+            total += work[v_id]
+            if total >= chunk_work:
+                chunks.append(chunk)
+                chunk = []
+                total = 0
+        if chunk:
+            chunks.append(chunk)
+
+        cycles_from = {}
+        with multiprocessing.Pool(processes, initializer=_init_cycle_worker,
+                                  initargs=(out_adj_lists, in_adj_lists, max_length)) as pool:
+            for results in pool.imap_unordered(_find_cycles_from_low_vertices, chunks):
+                cycles_from.update(results)
+
+        return [[self.vs[i] for i in cycle]
+                    for v_id in low_vertices for cycle in cycles_from[v_id]]
+
     def generate_cycles(self, max_length):
         """Generate cycles of length up to max_length in the digraph.
 
@@ -108,38 +232,12 @@ class Digraph:
         vertices, with the first vertex _not_ repeated at the end.
         """
 
-        vtx_used = [False] * len(self.vs)  # vtx_used[i]==True iff vertex i is in current path
-
-        def cycle(current_path):
-            last_vtx = current_path[-1]
-            if self.edge_exists(last_vtx, current_path[0]):
-                yield current_path[:]
-            if len(current_path) < max_length:
-                for e in last_vtx.edges: 
-                    v = e.tgt
-                    if (len(current_path) + shortest_paths_to_low_vtx[v.id] <= max_length
-                                and not vtx_used[v.id]):
-                        current_path.append(v)
-                        vtx_used[v.id] = True
-                        for c in cycle(current_path):
-                            yield c
-                        vtx_used[v.id] = False
-                        del current_path[-1]
-
-        # Adjacency lists for transpose graph
-        transp_adj_lists = [[] for v in self.vs]
-        for edge in self.es:
-            transp_adj_lists[edge.tgt.id].append(edge.src)
-
-        for v in self.vs:
-            if v is not None:
-                shortest_paths_to_low_vtx = self.calculate_shortest_path_lengths(
-                        v, max_length - 1,
-                        lambda u: (w for w in transp_adj_lists[u.id] if w.id > v.id))
-                vtx_used[v.id] = True
-                for c in cycle([v]):
-                    yield c
-                vtx_used[v.id] = False
+        out_adj_lists, in_adj_lists = self.int_adj_lists()
+        low_vertices = [v.id for v in self.vs if v is not None]
+        for low_vtx, cycles in generate_cycles_from_low_vertices(
+                    low_vertices, out_adj_lists, in_adj_lists, max_length):
+            for cycle in cycles:
+                yield [self.vs[i] for i in cycle]
     
     def get_shortest_path_from_low_vtx(self, low_vtx, max_path):
         """ Returns an array of path lengths. For each v > low_vtx, if the shortest
@@ -202,7 +300,17 @@ class Digraph:
     def induced_subgraph(self, vertices):
         """Returns the subgraph indiced by a given list of vertices."""
 
-        subgraph = Digraph(vertices)
+        subgraph = Digraph(list(range(len(vertices))), sparse=self.sparse)
+        for i, v in enumerate(vertices):
+            subgraph.vs[i].label = v.label
+        if self.sparse:
+            # Only visit existing edges
+            new_index = {v.id: i for i, v in enumerate(vertices)}
+            for i, v in enumerate(vertices):
+                for e in v.edges:
+                    if e.tgt.id in new_index:
+                        subgraph.add_edge(e.score, subgraph.vs[i], subgraph.vs[new_index[e.tgt.id]])
+            return subgraph
         for i, v in enumerate(vertices):
             for j, w in enumerate(vertices):
                 e = self.adj_mat[v.id][w.id]
@@ -215,29 +323,431 @@ class Digraph:
     def __str__(self):
         return "\n".join([str(v) for v in self.vs])
         
-def read_digraph(lines, vertices):
-    """Reads a digraph from an array of strings in the input format."""
+# The digraph searched by a cycle-finding worker process (see Digraph.find_cycles_parallel)
+_worker_graph = None
+
+def _init_cycle_worker(out_adj_lists, in_adj_lists, max_length):
+    global _worker_graph
+    _worker_graph = (out_adj_lists, in_adj_lists, max_length)
+
+def _find_cycles_from_low_vertices(low_vertices):
+    """Runs the search of Digraph.generate_cycles from each of the given low
+    vertices, in a worker process.
+
+    Returns:
+        a list of (low vertex id, cycles) pairs, with each cycle a list of vertex ids
+    """
+    out_adj_lists, in_adj_lists, max_length = _worker_graph
+    return list(generate_cycles_from_low_vertices(low_vertices, out_adj_lists, in_adj_lists, max_length))
+
+def generate_cycles_from_low_vertices(low_vertices, out_adj_lists, in_adj_lists, max_length, rank=None):
+    """Generate the cycles of length up to max_length through each of the
+    given low vertices, in which every other vertex ranks higher than the low
+    vertex. Searching from every vertex finds each cycle exactly once, from
+    its lowest-ranked vertex.
+
+    This is the cycle search used by Digraph.generate_cycles (and so by
+    CsrDigraph), Digraph.find_cycles_parallel and CycleIndex.
+
+    Args:
+        low_vertices: the ids of the vertices to search from, in order
+        out_adj_lists, in_adj_lists: the adjacency lists of the digraph, as
+            returned by Digraph.int_adj_lists
+        max_length: the maximum cycle length
+        rank: a sequence giving the rank of each vertex id, or None to rank
+            vertices by id
+
+    Yields:
+        a (low vertex id, cycles) pair for each low vertex, with each cycle a
+        list of vertex ids starting at the low vertex
+    """
+    n = len(out_adj_lists)
+    if rank is None:
+        rank = range(n)
+    vtx_used = [False] * n  # vtx_used[i]==True iff vertex i is in current path
+
+    def cycle(current_path):
+        last_vtx = current_path[-1]
+        if last_vtx in in_nbrs_of_low_vtx:
+            cycles.append(current_path[:])
+        if len(current_path) < max_length:
+            for v in out_adj_lists[last_vtx]:
+                if (len(current_path) + shortest_paths_to_low_vtx[v] <= max_length
+                            and not vtx_used[v]):
+                    current_path.append(v)
+                    vtx_used[v] = True
+                    cycle(current_path)
+                    vtx_used[v] = False
+                    del current_path[-1]
+
+    for low_vtx in low_vertices:
+        low_rank = rank[low_vtx]
+        cycles = []
+        in_nbrs_of_low_vtx = set(in_adj_lists[low_vtx])
+        # shortest path from each vertex back to low_vtx, through higher-ranked vertices only
+        shortest_paths_to_low_vtx = [999999999] * n
+        shortest_paths_to_low_vtx[low_vtx] = 0
+        q = deque([low_vtx])
+        while q:
+            v = q.popleft()
+            if shortest_paths_to_low_vtx[v] >= max_length - 1:
+                break
+            for w in in_adj_lists[v]:
+                if rank[w] > low_rank and shortest_paths_to_low_vtx[w] == 999999999:
+                    shortest_paths_to_low_vtx[w] = shortest_paths_to_low_vtx[v] + 1
+                    q.append(w)
+        vtx_used[low_vtx] = True
+        cycle([low_vtx])
+        vtx_used[low_vtx] = False
+        yield low_vtx, cycles
+
+def read_edge_lines(lines):
+    """Reads the edges from an array of strings in the .input or .ndds format.
+
+    Returns:
+        three lists: the source id num, target id num and score of each edge
+    """
 
     vtx_count, edge_count = [int(x) for x in lines[0].split()]
-    digraph = Digraph(vertices)
+    src_ids, tgt_ids, scores = [], [], []
     for line in lines[1:edge_count+1]:
         tokens = [x for x in line.split()]
-        src_id = int(tokens[0])
-        tgt_id = int(tokens[1])
-       # if src_id < 0 or src_id >= vtx_count:
-       #    raise KidneyReadException("Vertex index {} out of range.".format(src_id))
-       # if tgt_id < 0 or tgt_id >= vtx_count:
-       #     raise KidneyReadException("Vertex index {} out of range.".format(tgt_id))
-        if src_id == tgt_id:
-            raise KidneyReadException("Self-loop from {0} to {0} not permitted".format(src_id))
-        if digraph.edge_exists(digraph.vs[src_id], digraph.vs[tgt_id]):
-            raise KidneyReadException("Duplicate edge from {} to {}".format(src_id, tgt_id))
-        score = float(tokens[2])
-            
-        digraph.add_edge(score, digraph.vs[src_id], digraph.vs[tgt_id])
+        src_ids.append(int(tokens[0]))
+        tgt_ids.append(int(tokens[1]))
+        scores.append(float(tokens[2]))
 
     if lines[edge_count+1].split()[0] != "-1" or len(lines) < edge_count+2:
         raise KidneyReadException("Incorrect edge count")
 
+    return src_ids, tgt_ids, scores
+
+def write_edge_lines(n, src_ids, tgt_ids, scores):
+    """Writes edges as an array of strings in the .input or .ndds format.
+
+    Args:
+        n: Number of donor-patient pairs (for .input) or NDDs (for .ndds)
+        src_ids, tgt_ids, scores: the source, target and score of each edge
+    """
+
+    lines = ["{}\t{}\n".format(n, len(scores))]
+    for src_id, tgt_id, score in zip(src_ids, tgt_ids, scores):
+        lines.append("{}\t{}\t{}\n".format(src_id, tgt_id, score))
+    lines.append("-1\t-1\t-1\n")
+    return lines
+
+def build_digraph(vertices, src_ids, tgt_ids, scores, sparse=False):
+    """Builds a Digraph from arrays of edges.
+
+    Args:
+        vertices: a list of the id nums of the vertices
+        src_ids, tgt_ids: the id nums of the source and target of each edge
+        scores: the score of each edge
+        sparse: if True, build a sparse Digraph (see Digraph.__init__)
+    """
+
+    digraph = Digraph(vertices, sparse)
+    for src_id, tgt_id, score in zip(src_ids, tgt_ids, scores):
+        if src_id == tgt_id:
+            raise KidneyReadException("Self-loop from {0} to {0} not permitted".format(src_id))
+        src = digraph.get_vertex(src_id)
+        tgt = digraph.get_vertex(tgt_id)
+        if digraph.edge_exists(src, tgt):
+            raise KidneyReadException("Duplicate edge from {} to {}".format(src_id, tgt_id))
+        digraph.add_edge(float(score), src, tgt)
+
     return digraph
 
+def read_digraph(lines, vertices, sparse=False):
+    """Reads a digraph from an array of strings in the input format.
+
+    Args:
+        lines: the lines of the .input file
+        vertices: a list of the id nums of the vertices
+        sparse: if True, build a sparse Digraph (see Digraph.__init__)
+    """
+
+    src_ids, tgt_ids, scores = read_edge_lines(lines)
+    return build_digraph(vertices, src_ids, tgt_ids, scores, sparse)
+
+
+class CsrVertex:
+    """A vertex in a CsrDigraph.
+
+    Edges are not stored on the vertex; the edges property returns views of
+    this vertex's row of the digraph's CSR arrays. It allocates a view per
+    edge, so searches over the graph should use the CSR arrays (csr_lists)
+    or int_adj_lists instead.
+    """
+
+    def __init__(self, digraph, id, label):
+        self.digraph = digraph
+        self.id = id
+        self.label = label
+
+    @property
+    def edges(self):
+        indptr = self.digraph.indptr
+        return [CsrEdge(self.digraph, k) for k in range(indptr[self.id], indptr[self.id + 1])]
+
+    def __str__(self):
+        return ("V{}".format(self.id))
+
+class _CsrEdgeAttribute:
+    """An attribute of CsrEdge that is stored in a per-edge list on the digraph,
+    so that attributes set by the IP formulations (e.g. grb_vars) outlive the view."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, edge, owner):
+        if edge is None:
+            return self
+        values = edge.digraph.edge_attrs.get(self.name)
+        if values is None or values[edge.id] is None:
+            raise AttributeError(self.name)
+        return values[edge.id]
+
+    def __set__(self, edge, value):
+        values = edge.digraph.edge_attrs.setdefault(self.name, [None] * len(edge.digraph.indices))
+        values[edge.id] = value
+
+class CsrEdge:
+    """A view of an edge of a CsrDigraph, with the same members as Edge."""
+
+    __slots__ = ("digraph", "id")
+
+    grb_vars = _CsrEdgeAttribute()
+    grb_var_positions = _CsrEdgeAttribute()
+
+    def __init__(self, digraph, id):
+        self.digraph = digraph
+        self.id = id
+
+    @property
+    def score(self):
+        return float(self.digraph.scores[self.id])
+
+    @property
+    def src(self):
+        return self.digraph.vs[self.digraph.edge_src[self.id]]
+
+    @property
+    def tgt(self):
+        return self.digraph.vs[self.digraph.indices[self.id]]
+
+    def __str__(self):
+        return ("V" + str(self.src.id) + "-V" + str(self.tgt.id))
+
+class CsrEdgeList:
+    """A read-only sequence of CsrEdge views, used as CsrDigraph.es"""
+
+    def __init__(self, digraph):
+        self.digraph = digraph
+
+    def __len__(self):
+        return len(self.digraph.indices)
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError("edge index out of range")
+        return CsrEdge(self.digraph, k)
+
+    def __iter__(self):
+        return (CsrEdge(self.digraph, k) for k in range(len(self)))
+
+class CsrAdjacency:
+    """Read-only adj_mat for a CsrDigraph: adj_mat[i][j] is a CsrEdge or None."""
+
+    def __init__(self, digraph):
+        self.digraph = digraph
+
+    def __getitem__(self, i):
+        return CsrAdjacencyRow(self.digraph, i)
+
+class CsrAdjacencyRow:
+    def __init__(self, digraph, i):
+        self.digraph = digraph
+        self.i = i
+
+    def __getitem__(self, j):
+        k = self.digraph.edge_index(self.i, j)
+        return None if k < 0 else CsrEdge(self.digraph, k)
+
+class CsrDigraph(Digraph):
+    """A directed graph stored in compressed sparse row (CSR) form.
+
+    There is one CsrVertex object per vertex, but no object per edge. The
+    out-edges of vertex i are edges indptr[i]..indptr[i+1]-1, sorted by target.
+    Vertices are numbered 0..n-1 in the order of the id nums given, as in a
+    sparse Digraph. vs, es, adj_mat and edge_exists behave as in Digraph (es and
+    adj_mat return CsrEdge views), so the IP formulations can use either class.
+    The graph is immutable once built.
+
+    Data members:
+        n, max_n, vs, label_to_vtx: as in a sparse Digraph
+        indptr, indices, scores: the CSR arrays for out-edges
+        edge_src: the source vertex of each edge
+        in_indptr, in_indices: the CSR arrays for in-edges (the reverse graph)
+        in_edge_ids: in_edge_ids[k] is the edge id of the k-th in-edge
+        edge_attrs: per-edge attributes set on CsrEdge views
+    """
+
+    def __init__(self, n, src, tgt, scores):
+        """Create a CsrDigraph
+
+        Args:
+            n: a list of the id nums of the vertices
+            src, tgt: the source and target of each edge, as indices into n
+            scores: the score of each edge
+        """
+        self.n = len(n)
+        self.max_n = max(n)
+        self.sparse = True
+        self.vs = [CsrVertex(self, i, label) for i, label in enumerate(n)]
+        self.label_to_vtx = {v.label: v for v in self.vs}
+
+        src = np.asarray(src, dtype=np.intp)
+        tgt = np.asarray(tgt, dtype=np.intp)
+        scores = np.asarray(scores, dtype=float)
+        if np.any(src == tgt):
+            i = src[np.argmax(src == tgt)]
+            raise KidneyReadException("Self-loop from {0} to {0} not permitted".format(n[i]))
+        order = np.lexsort((tgt, src))
+        src, tgt, scores = src[order], tgt[order], scores[order]
+        duplicate = (src[1:] == src[:-1]) & (tgt[1:] == tgt[:-1])
+        if np.any(duplicate):
+            k = np.argmax(duplicate)
+            raise KidneyReadException("Duplicate edge from {} to {}".format(n[src[k]], n[tgt[k]]))
+
+        self.indptr = np.zeros(self.n + 1, dtype=np.intp)
+        np.cumsum(np.bincount(src, minlength=self.n), out=self.indptr[1:])
+        self.indices = tgt
+        self.scores = scores
+        self.edge_src = src
+
+        self.in_edge_ids = np.argsort(tgt, kind="stable")
+        self.in_indptr = np.zeros(self.n + 1, dtype=np.intp)
+        np.cumsum(np.bincount(tgt, minlength=self.n), out=self.in_indptr[1:])
+        self.in_indices = src[self.in_edge_ids]
+
+        self.es = CsrEdgeList(self)
+        self.adj_mat = CsrAdjacency(self)
+        self.edge_attrs = {}
+        self._csr_lists = None
+
+    def add_edge(self, score, source, tgt):
+        raise TypeError("A CsrDigraph is immutable; build a new one with build_csr_digraph")
+
+    def int_adj_lists(self):
+        """Returns the out- and in-adjacency lists of the digraph as lists of
+        lists of vertex ids."""
+
+        indptr, indices, in_indptr, in_indices = self.csr_lists()
+        out_adj_lists = [indices[start:end] for start, end in zip(indptr[:-1], indptr[1:])]
+        in_adj_lists = [in_indices[start:end] for start, end in zip(in_indptr[:-1], in_indptr[1:])]
+        return out_adj_lists, in_adj_lists
+
+    def edge_arrays(self):
+        """Returns the source vertex ids, target vertex ids and scores of the
+        edges, as NumPy arrays indexed by edge id."""
+
+        return self.edge_src, self.indices, self.scores
+
+    def csr_lists(self):
+        """Returns indptr, indices, in_indptr and in_indices as Python lists,
+        which are faster to traverse element by element than NumPy arrays.
+        The lists are built on the first call and kept, as the graph is immutable."""
+
+        if self._csr_lists is None:
+            self._csr_lists = (self.indptr.tolist(), self.indices.tolist(),
+                               self.in_indptr.tolist(), self.in_indices.tolist())
+        return self._csr_lists
+
+    def get_shortest_path_from_low_vtx(self, low_vtx, max_path):
+        """As Digraph.get_shortest_path_from_low_vtx, searching the CSR arrays."""
+        indptr, indices, __, __ = self.csr_lists()
+        return _bfs_distances(low_vtx, max_path, indptr, indices, self.n, low_vtx - 1)
+
+    def get_shortest_path_to_low_vtx(self, low_vtx, max_path):
+        """As Digraph.get_shortest_path_to_low_vtx, searching the CSR arrays."""
+        __, __, in_indptr, in_indices = self.csr_lists()
+        return _bfs_distances(low_vtx, max_path, in_indptr, in_indices, self.n, low_vtx - 1)
+
+    def edge_index(self, i, j):
+        """Returns the id of the edge from vertex i to vertex j, or -1 if there is none."""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        k = start + np.searchsorted(self.indices[start:end], j)
+        if k < end and self.indices[k] == j:
+            return int(k)
+        return -1
+
+    def edge_exists(self, v1, v2):
+        """Returns true if and only if an edge exists from Vertex v1 to Vertex v2."""
+        return self.edge_index(v1.id, v2.id) >= 0
+
+    def induced_subgraph(self, vertices):
+        """Returns the subgraph indiced by a given list of vertices."""
+
+        new_index = np.full(self.n, -1, dtype=np.intp)
+        new_index[[v.id for v in vertices]] = np.arange(len(vertices))
+        keep = (new_index[self.edge_src] >= 0) & (new_index[self.indices] >= 0)
+        return CsrDigraph([v.label for v in vertices], new_index[self.edge_src[keep]],
+                          new_index[self.indices[keep]], self.scores[keep])
+
+def _bfs_distances(from_id, max_dist, indptr, indices, n, min_id=-1):
+    """Breadth-first search on CSR arrays (as lists) from vertex from_id,
+    using only vertices with index greater than min_id apart from from_id.
+
+    Returns a list of distances, as in Digraph.calculate_shortest_path_lengths.
+    """
+    q = deque([from_id])
+    distances = [999999999] * n
+    distances[from_id] = 0
+
+    while q:
+        v = q.popleft()
+        if distances[v] >= max_dist:
+            break
+        for w in indices[indptr[v]:indptr[v + 1]]:
+            if w > min_id and distances[w] == 999999999:
+                distances[w] = distances[v] + 1
+                q.append(w)
+
+    return distances
+
+def build_csr_digraph(vertices, src_ids, tgt_ids, scores):
+    """Builds a CsrDigraph from arrays of edges.
+
+    Args:
+        vertices: a list of the id nums of the vertices
+        src_ids, tgt_ids: the id nums of the source and target of each edge
+        scores: the score of each edge
+    """
+
+    labels = np.asarray(vertices, dtype=np.intp)
+    order = np.argsort(labels)
+    sorted_labels = labels[order]
+
+    def to_index(ids):
+        ids = np.asarray(ids, dtype=np.intp)
+        pos = np.searchsorted(sorted_labels, ids)
+        pos[pos == len(sorted_labels)] = 0
+        missing = sorted_labels[pos] != ids if len(ids) else np.zeros(0, dtype=bool)
+        if np.any(missing):
+            raise KidneyReadException("Vertex index {} out of range.".format(ids[np.argmax(missing)]))
+        return order[pos]
+
+    return CsrDigraph(vertices, to_index(src_ids), to_index(tgt_ids), scores)
+
+def read_csr_digraph(lines, vertices):
+    """Reads a CsrDigraph from an array of strings in the input format.
+
+    Args:
+        lines: the lines of the .input file
+        vertices: a list of the id nums of the vertices
+    """
+
+    src_ids, tgt_ids, scores = read_edge_lines(lines)
+    return build_csr_digraph(vertices, src_ids, tgt_ids, scores)
@@ -0,0 +1,421 @@
+"""An open-source MILP backend for kidney_ip, using the HiGHS solver through
+scipy.optimize.milp.
+
+This module implements the small part of the gurobipy interface that the IP
+formulations use (Model, addVar, addConstr, setObjective, remove, quicksum,
+Column, GRB and Var.x, and the matrix interface addMVar, addMConstr and
+MVar.X), so that the formulations can run unchanged without a Gurobi licence.
+kidney_ip imports it in place of gurobipy when MILP_SOLVER is "HIGHS".
+MIP starts (Var.Start) are accepted but not used, as scipy.optimize.milp does not
+take an initial solution; a warning is logged the first time one is set. Models
+cannot be written to files (there is no Model.write), and create_ip_model rejects
+an lp_file when this backend is used.
+"""
+
+import logging
+import time
+
+import numpy as np
+import scipy.sparse
+from scipy.optimize import milp, Bounds, LinearConstraint
+
+logger = logging.getLogger(__name__)
+
+# True once the warning that MIP starts are ignored has been logged
+_start_warning_logged = False
+
+def _warn_start_ignored():
+    """Logs a warning, once per process, that a MIP start was set and will not be used."""
+    global _start_warning_logged
+    if not _start_warning_logged:
+        logger.warning("MIP starts (Start) are ignored by the HiGHS backend, "
+                       "as scipy.optimize.milp does not take an initial solution")
+        _start_warning_logged = True
+
+class GRB:
+    """Constants with the same meaning as the gurobipy constants of the same name"""
+    BINARY = "B"
+    INTEGER = "I"
+    CONTINUOUS = "C"
+    MINIMIZE = 1
+    MAXIMIZE = -1
+    INFINITY = float("inf")
+    LESS_EQUAL = "<"
+    GREATER_EQUAL = ">"
+    EQUAL = "="
+    # Status codes
+    LOADED = 1
+    OPTIMAL = 2
+    INFEASIBLE = 3
+    UNBOUNDED = 5
+    TIME_LIMIT = 9
+
+class HighsError(Exception):
+    """Raised when HiGHS fails to solve a model, as gurobipy raises GurobiError"""
+
+class LinExpr:
+    """A linear expression: a constant plus a sum of coefficient * variable terms.
+
+    Data members:
+        coeffs: a dict from Var to coefficient
+        constant: the constant term
+    """
+
+    def __init__(self, coeffs=None, constant=0.0):
+        self.coeffs = {} if coeffs is None else coeffs
+        self.constant = constant
+
+    def copy(self):
+        return LinExpr(dict(self.coeffs), self.constant)
+
+    def add(self, other, mult=1.0):
+        """Add mult * other to this expression, in place."""
+        if isinstance(other, Var):
+            self.coeffs[other] = self.coeffs.get(other, 0.0) + mult
+        elif isinstance(other, LinExpr):
+            for var, coeff in other.coeffs.items():
+                self.coeffs[var] = self.coeffs.get(var, 0.0) + mult * coeff
+            self.constant += mult * other.constant
+        else:
+            self.constant += mult * other
+        return self
+
+    def __add__(self, other):
+        return self.copy().add(other)
+
+    __radd__ = __add__
+
+    def __iadd__(self, other):
+        return self.add(other)
+
+    def __sub__(self, other):
+        return self.copy().add(other, -1.0)
+
+    def __rsub__(self, other):
+        return (-1.0 * self).add(other)
+
+    def __mul__(self, scalar):
+        return LinExpr({var: scalar * coeff for var, coeff in self.coeffs.items()},
+                       scalar * self.constant)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return -1.0 * self
+
+    def __le__(self, other):
+        return TempConstr(self - other, "<=")
+
+    def __ge__(self, other):
+        return TempConstr(self - other, ">=")
+
+    def __eq__(self, other):
+        return TempConstr(self - other, "==")
+
+    __hash__ = object.__hash__
+
+class Var:
+    """A variable of a Model. After optimisation, x is its value."""
+
+    def __init__(self, model, index, lb, ub, vtype):
+        self.model = model
+        self.index = index
+        self.lb = lb
+        self.ub = ub
+        self.vtype = vtype
+        self.removed = False
+        self._start = None
+
+    @property
+    def Start(self):
+        return self._start
+
+    @Start.setter
+    def Start(self, value):
+        if value is not None:
+            _warn_start_ignored()
+        self._start = value
+
+    @property
+    def x(self):
+        if self.model.solution is None:
+            raise AttributeError("Unable to retrieve attribute 'x'")
+        return self.model.solution[self.index]
+
+    def _expr(self):
+        return LinExpr({self: 1.0})
+
+    def __add__(self, other):
+        return self._expr().add(other)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return self._expr().add(other, -1.0)
+
+    def __rsub__(self, other):
+        return (-1.0 * self._expr()).add(other)
+
+    def __mul__(self, scalar):
+        return LinExpr({self: float(scalar)})
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return LinExpr({self: -1.0})
+
+    def __le__(self, other):
+        return self._expr() <= other
+
+    def __ge__(self, other):
+        return self._expr() >= other
+
+    def __eq__(self, other):
+        return self._expr() == other
+
+    __hash__ = object.__hash__
+
+class MVar:
+    """A vector of variables, as added by Model.addMVar. After optimisation, X is their values."""
+
+    def __init__(self, model, vars):
+        self.model = model
+        self.vars = vars
+        self._start = None
+
+    @property
+    def Start(self):
+        return self._start
+
+    @Start.setter
+    def Start(self, value):
+        if value is not None:
+            _warn_start_ignored()
+        self._start = value
+
+    def __len__(self):
+        return len(self.vars)
+
+    @property
+    def X(self):
+        if self.model.solution is None:
+            raise AttributeError("Unable to retrieve attribute 'X'")
+        return self.model.solution[self.indices()]
+
+    def indices(self):
+        return np.fromiter((var.index for var in self.vars), dtype=np.intp, count=len(self.vars))
+
+class TempConstr:
+    """A constraint expr <= 0, expr >= 0 or expr == 0, as built by comparing expressions"""
+
+    def __init__(self, expr, sense):
+        self.expr = expr
+        self.sense = sense
+        self.removed = False
+
+class Column:
+    """The coefficients of a new variable in existing constraints, as passed to Model.addVar"""
+
+    def __init__(self, coeffs=(), constrs=()):
+        self.coeffs = list(coeffs)
+        self.constrs = list(constrs)
+
+def quicksum(terms):
+    """Returns the sum of an iterable of variables, expressions and numbers."""
+    expr = LinExpr()
+    for term in terms:
+        expr.add(term)
+    return expr
+
+class Params:
+    """Solver parameters, set as attributes (e.g. m.params.timelimit = 10).
+    Parameters which HiGHS does not use (e.g. method, presolve) are accepted and ignored."""
+
+    def __init__(self):
+        self.outputflag = 1
+        self.mipGap = 1e-4
+        self.timelimit = None
+
+class Model:
+    """A mixed-integer linear program, solved with HiGHS.
+
+    Data members:
+        params: the solver parameters
+        status: a GRB status code
+        runtime: the time taken by the last call to optimize(), in seconds
+        obj_val: the objective value of the solution
+        solution: the values of the variables, or None before optimisation
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self.params = Params()
+        self.vars = []
+        self.constrs = []
+        self.matrix_constrs = []
+        self.objective = LinExpr()
+        self.matrix_objective = []
+        self.sense = GRB.MINIMIZE
+        self.relaxed = False
+        self.has_removed = False
+        self.status = GRB.LOADED
+        self.runtime = 0.0
+        self.obj_val = None
+        self.solution = None
+
+    @property
+    def numVars(self):
+        return sum(1 for var in self.vars if not var.removed)
+
+    @property
+    def numConstrs(self):
+        return (sum(1 for constr in self.constrs if not constr.removed) +
+                sum(A.shape[0] for A, x, sense, b in self.matrix_constrs))
+
+    @property
+    def ModelSense(self):
+        return self.sense
+
+    @ModelSense.setter
+    def ModelSense(self, sense):
+        self.sense = sense
+
+    def addVar(self, lb=0.0, ub=None, obj=0.0, vtype=GRB.CONTINUOUS, name="", column=None):
+        if vtype == GRB.BINARY:
+            lb, ub = max(lb, 0.0), 1.0 if ub is None else min(ub, 1.0)
+        var = Var(self, len(self.vars), lb, GRB.INFINITY if ub is None else ub, vtype)
+        self.vars.append(var)
+        if obj:
+            self.objective.add(var, obj)
+        if column is not None:
+            for coeff, constr in zip(column.coeffs, column.constrs):
+                constr.expr.add(var, coeff)
+        return var
+
+    def addMVar(self, shape, lb=0.0, ub=None, obj=0.0, vtype=GRB.CONTINUOUS, name=""):
+        """Adds a vector of shape variables. obj may be a number or an array of objective coefficients."""
+        x = MVar(self, [self.addVar(lb=lb, ub=ub, vtype=vtype) for __ in range(shape)])
+        self.matrix_objective.append((x, np.broadcast_to(np.asarray(obj, dtype=float), (shape,))))
+        return x
+
+    def addMConstr(self, A, x, sense, b, name=""):
+        """Adds the constraints A @ x <sense> b, for a scipy.sparse (or dense) matrix A, an MVar x,
+        a sense GRB.LESS_EQUAL, GRB.GREATER_EQUAL or GRB.EQUAL and an array b."""
+        b = np.broadcast_to(np.asarray(b, dtype=float), (A.shape[0],))
+        self.matrix_constrs.append((scipy.sparse.csr_matrix(A), x, sense, b))
+
+    def addConstr(self, constr, name=""):
+        if not isinstance(constr, TempConstr):
+            raise TypeError("addConstr expects a constraint such as expr <= rhs")
+        self.constrs.append(constr)
+        return constr
+
+    def setObjective(self, expr, sense=GRB.MINIMIZE):
+        self.objective = quicksum([expr])
+        self.sense = sense
+
+    def chgCoeff(self, constr, var, newvalue):
+        constr.expr.coeffs[var] = newvalue
+
+    def remove(self, item):
+        """Removes a variable or a constraint from the model."""
+        item.removed = True
+        self.has_removed = True
+
+    def compact(self):
+        """Drops the removed variables and constraints, and renumbers the remaining variables."""
+        self.vars = [var for var in self.vars if not var.removed]
+        for i, var in enumerate(self.vars):
+            var.index = i
+        self.constrs = [constr for constr in self.constrs if not constr.removed]
+        for expr in [self.objective] + [constr.expr for constr in self.constrs]:
+            expr.coeffs = {var: coeff for var, coeff in expr.coeffs.items() if not var.removed}
+        self.has_removed = False
+
+    def update(self):
+        pass
+
+    def relax(self):
+        """Returns a copy of the model in which all variables are continuous."""
+        r = Model(self.name)
+        r.params = self.params
+        self.compact()
+        r.vars = self.vars
+        r.constrs = self.constrs
+        r.matrix_constrs = self.matrix_constrs
+        r.objective = self.objective
+        r.matrix_objective = self.matrix_objective
+        r.sense = self.sense
+        r.relaxed = True
+        return r
+
+    def optimize(self):
+        start_time = time.time()
+        if self.has_removed:
+            self.compact()
+        n = len(self.vars)
+        if n == 0:
+            # scipy.optimize.milp needs at least one variable
+            self.solution = np.zeros(0)
+            self.obj_val = self.objective.constant
+            self.status = GRB.OPTIMAL
+            self.runtime = time.time() - start_time
+            return
+
+        c = np.zeros(n)
+        for var, coeff in self.objective.coeffs.items():
+            c[var.index] += coeff
+        for x, obj in self.matrix_objective:
+            c[x.indices()] += obj
+        c *= self.sense
+
+        rows, cols, vals = [], [], []
+        lb = np.empty(len(self.constrs))
+        ub = np.empty(len(self.constrs))
+        for i, constr in enumerate(self.constrs):
+            for var, coeff in constr.expr.coeffs.items():
+                rows.append(i)
+                cols.append(var.index)
+                vals.append(coeff)
+            rhs = -constr.expr.constant
+            lb[i] = rhs if constr.sense in (">=", "==") else -np.inf
+            ub[i] = rhs if constr.sense in ("<=", "==") else np.inf
+        constraints = []
+        if self.constrs:
+            A = scipy.sparse.csr_matrix((vals, (rows, cols)), shape=(len(self.constrs), n))
+            constraints.append(LinearConstraint(A, lb, ub))
+        for A, x, sense, b in self.matrix_constrs:
+            if A.shape[0] == 0:
+                continue
+            # Move the columns of A to the positions of x's variables in the model
+            A = A.tocoo()
+            A = scipy.sparse.csr_matrix((A.data, (A.row, x.indices()[A.col])), shape=(A.shape[0], n))
+            constraints.append(LinearConstraint(A, b if sense != GRB.LESS_EQUAL else -np.inf,
+                                                b if sense != GRB.GREATER_EQUAL else np.inf))
+
+        options = {"disp": bool(self.params.outputflag),
+                   "mip_rel_gap": self.params.mipGap}
+        if self.params.timelimit is not None:
+            options["time_limit"] = self.params.timelimit
+        integrality = np.array([0 if self.relaxed or var.vtype == GRB.CONTINUOUS else 1
+                                for var in self.vars])
+        bounds = Bounds(np.array([var.lb for var in self.vars], dtype=float),
+                        np.array([var.ub for var in self.vars], dtype=float))
+        result = milp(c, constraints=constraints, integrality=integrality, bounds=bounds,
+                      options=options)
+
+        self.runtime = time.time() - start_time
+        if result.x is not None:
+            self.solution = result.x
+            self.obj_val = self.sense * result.fun + self.objective.constant
+        if result.status == 0:
+            self.status = GRB.OPTIMAL
+        elif result.status == 1:
+            self.status = GRB.TIME_LIMIT
+        elif result.status == 2:
+            self.status = GRB.INFEASIBLE
+        elif result.status == 3:
+            self.status = GRB.UNBOUNDED
+        else:
+            self.status = GRB.LOADED
+            raise HighsError("HiGHS failed to solve the model: " + str(result.message))
@@ -1,14 +1,23 @@
-"""Solving the kidney-exchange problem using the Gurobi IP solver."""
+"""Solving the kidney-exchange problem using the Gurobi IP solver, or HiGHS
+(see kidney_highs) if MILP_SOLVER is "HIGHS"."""
 
 import copy
+import multiprocessing
 import sys
 
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+
 from algorithms.kidney_solver.kidney_digraph import *
 from algorithms.kidney_solver.kidney_ndds import *
 import algorithms.kidney_solver.kidney_utils as kidney_utils
-from config import PRINT
+from config import PRINT, MILP_SOLVER
 
-from gurobipy import *
+if MILP_SOLVER == "HIGHS":
+    from algorithms.kidney_solver.kidney_highs import Model, GRB, quicksum, Column
+else:
+    from gurobipy import *
 
 ###################################################################################################
 #                                                                                                 #
@@ -30,11 +39,14 @@ class OptConfig(object):
         eef_alt_constraints: True if and only if alternative EEF constraints should be used
         lp_file: The name of a .lp file to write, or None if the file should not be written
         relax: True if and only if the LP relaxation should be solved also
+        cycles: The cycles of the digraph up to the cycle cap, each a list of Vertex objects,
+            or None if the formulation should find them (used by PICEF and the cycle formulation)
+        cycle_processes: The number of processes used to find the cycles
     """
 
     def __init__(self, digraph, ndds, max_cycle, max_chain, verbose=False,
                  timelimit=None, edge_success_prob=1, eef_alt_constraints=False,
-                 lp_file=None, relax=False):
+                 lp_file=None, relax=False, cycles=None, cycle_processes=1):
         self.digraph = digraph
         self.ndds = ndds
         self.max_cycle = max_cycle
@@ -45,12 +57,14 @@ class OptConfig(object):
         self.eef_alt_constraints = eef_alt_constraints
         self.lp_file = lp_file
         self.relax = relax
+        self.cycles = cycles
+        self.cycle_processes = cycle_processes
 
 class OptSolution(object):
     """An optimal solution for a kidney-exchange problem instance.
     
     Data members:
-        ip_model: The Gurobi Model object
+        ip_model: The Gurobi (or kidney_highs) Model object
         cycles: A list of cycles in the optimal solution, each represented
             as a list of vertices
         chains: A list of chains in the optimal solution, each represented
@@ -68,15 +82,19 @@ class OptSolution(object):
         self.edge_success_prob = edge_success_prob
 
     def display(self,altruists=list()):
-        """Print the optimal cycles and chains to standard output."""
+        """Print the optimal cycles and chains to standard output.
+
+        Returns:
+            the cycles and the chains, each as a list of pair id nums
+        """
 
         if (PRINT):
             print(("cycle_count: {}".format(len(self.cycles))))
             print(("chain_count: {}".format(len(self.chains))))
             print("cycles:")
-        # cs is a list of cycles, with each cycle represented as a list of vertex IDs
-        cs = [[v.id for v in c] for c in self.cycles]
-        cycles = [[v.id for v in c] for c in self.cycles]
+        # cs is a list of cycles, with each cycle represented as a list of pair id nums
+        cs = [[v.label for v in c] for c in self.cycles]
+        cycles = [[v.label for v in c] for c in self.cycles]
         chains = [None]*len(self.chains)
         # Put the lowest-indexed vertex at the start of each cycle
         for i in range(len(cs)):
@@ -93,8 +111,8 @@ class OptSolution(object):
         for c in self.chains:
             index = c.ndd_index
             if (PRINT):
-                print((str(altruists[index]) + "\t" + "\t".join(str(v) for v in c.vtx_indices)))
-            chains[i] = [v for v in c.vtx_indices]
+                print((str(altruists[index]) + "\t" + "\t".join(str(self.digraph.vs[v].label) for v in c.vtx_indices)))
+            chains[i] = [self.digraph.vs[v].label for v in c.vtx_indices]
             i += 1
         return cycles, chains
 
@@ -154,13 +172,148 @@ def optimise_relabelled(formulation_fun, cfg):
     relabelled_cfg = copy.copy(cfg)
     relabelled_cfg.digraph = relabelled_digraph
     relabelled_cfg.ndds = relabelled_ndds
+    relabelled_cfg.cycles = None
 
     opt_result = formulation_fun(relabelled_cfg)
     return opt_result.relabelled_copy(sorted_vertices, cfg.digraph)
 
-def create_ip_model(time_limit, verbose):
-    """Create a Gurobi Model."""
+class ComponentModels(object):
+    """Stands in for the Gurobi Model of an OptSolution found by
+    optimise_decomposed, summarising the models of the subproblems.
+
+    Data members:
+        numVars, numConstrs: the totals over the subproblem models
+        runtime: the total solver time of the subproblem models, in seconds
+        status: GRB.OPTIMAL if every subproblem was solved to optimality,
+            and otherwise the status of the first subproblem that was not
+        obj_val: the total objective value
+        num_subproblems: the number of subproblems solved
+    """
+
+    def __init__(self, stats):
+        self.numVars = sum(s[0] for s in stats)
+        self.numConstrs = sum(s[1] for s in stats)
+        self.runtime = sum(s[2] for s in stats)
+        self.status = next((s[3] for s in stats if s[3] != GRB.OPTIMAL), GRB.OPTIMAL)
+        self.obj_val = sum(s[4] for s in stats)
+        self.num_subproblems = len(stats)
+
+def solve_subproblem(args):
+    """Solve a subproblem of optimise_decomposed, returning the solution in a
+    form that can be sent between processes.
+
+    Args:
+        args: a tuple (formulation_fun, cfg)
+
+    Returns:
+        the cycles as lists of vertex ids, the chains as (ndd_index, vtx_indices, score),
+        and (numVars, numConstrs, runtime, status, total_score) of the model
+    """
+
+    formulation_fun, cfg = args
+    opt_result = formulation_fun(cfg)
+    m = opt_result.ip_model
+    return ([[v.id for v in c] for c in opt_result.cycles],
+            [(c.ndd_index, c.vtx_indices, c.score) for c in opt_result.chains],
+            (m.numVars, m.numConstrs, m.runtime, m.status, opt_result.total_score))
+
+def optimise_decomposed(formulation_fun, cfg, processes=1):
+    """Optimise by solving each strongly connected component of the digraph
+    separately, and merging the solutions.
+
+    No cycle crosses two strongly connected components, and chains only use
+    vertices that can be reached from an NDD. The vertices reachable from an
+    NDD (a union of components) form one subproblem with the NDDs, and each
+    other component with more than one vertex forms a subproblem with cycles only.
+    Components with one vertex have no cycles and are left out.
+
+    Args:
+        formulation_fun: the formulation used for each subproblem, e.g. optimise_picef
+        cfg: an OptConfig object
+        processes: the number of processes used to solve the subproblems
+            (1 to solve them in this process)
+
+    Returns:
+        an OptSolution object, whose ip_model is a ComponentModels
+    """
+
+    digraph = cfg.digraph
+    src, tgt, __ = digraph.edge_arrays()
+    graph = scipy.sparse.csr_matrix((np.ones(len(src)), (src, tgt)), shape=(len(digraph.vs), len(digraph.vs)))
+    __, components = scipy.sparse.csgraph.connected_components(graph, directed=True, connection="strong")
+
+    # Give every vertex reachable from an NDD the component number -1
+    if cfg.max_chain > 0 and cfg.ndds:
+        dists_from_ndd = np.array(kidney_utils.get_dist_from_nearest_ndd(digraph, cfg.ndds))
+        components[dists_from_ndd < 999999999] = -1
+
+    component_vertices = {}
+    for v in digraph.vs:
+        if v is not None:
+            component_vertices.setdefault(components[v.id], []).append(v)
+    subproblems = [vertices for component, vertices in component_vertices.items()
+                   if len(vertices) > 1 or component == -1]
+    # Solve the largest subproblems first, so that the processes finish at similar times
+    subproblems.sort(key=len, reverse=True)
+
+    old_to_new_vtx = [None] * len(digraph.vs)
+    subproblem_index = [None] * len(digraph.vs)
+    sub_cfgs = []
+    for k, vertices in enumerate(subproblems):
+        sub_digraph = digraph.induced_subgraph(vertices)
+        for i, v in enumerate(vertices):
+            old_to_new_vtx[v.id] = sub_digraph.vs[i]
+            subproblem_index[v.id] = k
+        sub_cfg = copy.copy(cfg)
+        sub_cfg.digraph = sub_digraph
+        if components[vertices[0].id] == -1:
+            sub_cfg.ndds = create_relabelled_ndds(cfg.ndds, old_to_new_vtx)
+        else:
+            sub_cfg.ndds = []
+            sub_cfg.max_chain = 0
+        sub_cfg.cycles = None if cfg.cycles is None else []
+        if processes > 1:
+            sub_cfg.cycle_processes = 1
+        sub_cfgs.append(sub_cfg)
+
+    # Hand each known cycle to the subproblem containing it
+    for c in cfg.cycles or []:
+        k = subproblem_index[c[0].id]
+        if k is not None:
+            sub_cfgs[k].cycles.append([old_to_new_vtx[v.id] for v in c])
+
+    tasks = [(formulation_fun, sub_cfg) for sub_cfg in sub_cfgs]
+    if processes > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(solve_subproblem, tasks, chunksize=1)
+    else:
+        results = [solve_subproblem(task) for task in tasks]
+
+    cycles = []
+    chains = []
+    for vertices, (sub_cycles, sub_chains, __) in zip(subproblems, results):
+        cycles.extend([vertices[i] for i in c] for c in sub_cycles)
+        chains.extend(Chain(ndd_index, [vertices[i].id for i in vtx_indices], score)
+                      for ndd_index, vtx_indices, score in sub_chains)
+
+    return OptSolution(ip_model=ComponentModels([stats for __, __, stats in results]),
+                       cycles=cycles,
+                       chains=chains,
+                       digraph=digraph,
+                       edge_success_prob=cfg.edge_success_prob)
+
+def create_ip_model(time_limit, verbose, lp_file=None):
+    """Create a Gurobi Model, or a kidney_highs Model with the same interface.
+
+    Args:
+        lp_file: the .lp file that the model will be written to, or None. The
+            HiGHS backend cannot write model files, so this fails before the
+            model is built rather than after.
+    """
 
+    if lp_file and MILP_SOLVER == "HIGHS":
+        raise ValueError("Writing the model to {} needs MILP_SOLVER = \"GUROBI\"; "
+                         "the HiGHS backend cannot write model files".format(lp_file))
     m = Model("kidney-mip")
     if not verbose:
         m.params.outputflag = 0
@@ -229,7 +382,7 @@ def optimise_uuef(cfg):
     if cfg.edge_success_prob != 1:
         raise ValueError("This formulation does not support failure-aware matching.")
 
-    m = create_ip_model(cfg.timelimit, cfg.verbose)
+    m = create_ip_model(cfg.timelimit, cfg.verbose, cfg.lp_file)
 
     add_unlimited_vars_and_constraints(cfg.digraph, cfg.ndds, m)
 
@@ -440,7 +593,7 @@ def optimise_hpief_prime(cfg, full_red=False, hpief_2_prime=False):
     if cfg.max_cycle < 3:
         hpief_2_prime = False
 
-    m = create_ip_model(cfg.timelimit, cfg.verbose)
+    m = create_ip_model(cfg.timelimit, cfg.verbose, cfg.lp_file)
     m.params.method = 2
     m.params.presolve = 0
 
@@ -525,9 +678,11 @@ def optimise_picef(cfg):
         an OptSolution object
     """
 
-    cycles = cfg.digraph.find_cycles(cfg.max_cycle)
+    cycles = cfg.cycles
+    if cycles is None:
+        cycles = cfg.digraph.find_cycles(cfg.max_cycle, cfg.cycle_processes)
 
-    m = create_ip_model(cfg.timelimit, cfg.verbose)
+    m = create_ip_model(cfg.timelimit, cfg.verbose, cfg.lp_file)
     m.params.method = 2
 
     cycle_vars = [m.addVar(vtype=GRB.BINARY) for __ in cycles]
@@ -571,6 +726,164 @@ def optimise_picef(cfg):
                        digraph=cfg.digraph,
                        edge_success_prob=cfg.edge_success_prob)
 
+###################################################################################################
+#                                                                                                 #
+#                                         Incremental PICEF                                       #
+#                                                                                                 #
+###################################################################################################
+
+class IncrementalPicefModel(object):
+    """A PICEF model that is kept between solves, for a pool in which vertices
+    and NDDs arrive and leave over time.
+
+    The variables and constraints are keyed by vertex and NDD labels. Each call
+    to optimise() adds only the variables and constraints of the vertices,
+    cycles, edges and NDDs that the model does not have yet, and remove_vertex()
+    removes those of a vertex or NDD that has left. Edge scores are assumed not
+    to change while both endpoints remain in the pool.
+
+    Unlike optimise_picef, a chain edge has a variable for every position up to
+    the chain cap rather than only for the positions reachable from an NDD, as
+    the NDDs change between solves. The flow constraints force the unreachable
+    variables to zero, so the optimal score is the same.
+    Only edge_success_prob == 1 is supported.
+
+    Data members:
+        m: The Gurobi (or kidney_highs) Model
+        max_cycle
+        max_chain
+        cycle_vars: A dict from each cycle, as a tuple of vertex labels starting
+            with the lowest label, to its variable
+        edge_vars: A dict from (source label, target label) to the variables of
+            the edge at chain positions 1 to max_chain-1
+        ndd_edge_vars: A dict from (NDD label, target label) to the edge's variable
+        capacity_constrs: A dict from each vertex label to the constraint that
+            the vertex is used at most once
+        flow_constrs: A dict from each vertex label to its flow constraints,
+            one per chain position
+        ndd_constrs: A dict from each NDD label to the constraint that the NDD
+            is used at most once
+        label_to_keys: A dict from each label to (store, key) pairs giving the
+            variables and constraints to remove with it
+    """
+
+    def __init__(self, max_cycle, max_chain, timelimit=None, verbose=False):
+        self.m = create_ip_model(timelimit, verbose)
+        self.m.params.method = 2
+        self.m.ModelSense = GRB.MAXIMIZE
+        self.max_cycle = max_cycle
+        self.max_chain = max_chain
+        self.cycle_vars = {}
+        self.edge_vars = {}
+        self.ndd_edge_vars = {}
+        self.capacity_constrs = {}
+        self.flow_constrs = {}
+        self.ndd_constrs = {}
+        self.label_to_keys = {}
+
+    def _add(self, store, key, item, labels):
+        store[key] = item
+        for label in labels:
+            self.label_to_keys.setdefault(label, []).append((store, key))
+
+    def remove_vertex(self, label):
+        """Remove the variables and constraints of a vertex or NDD that has left
+        the pool. Does nothing if the model has none for the label.
+        """
+
+        for store, key in self.label_to_keys.pop(label, ()):
+            item = store.pop(key, None)
+            if item is None:
+                continue
+            for x in (item if isinstance(item, list) else [item]):
+                self.m.remove(x)
+
+    def update(self, digraph, ndds, ndd_labels, cycles):
+        """Add the variables and constraints that the model does not have yet.
+
+        Also sets e.grb_vars on each edge of the digraph and e.edge_var on each
+        NDD edge, so that kidney_utils.get_optimal_chains can read the solution.
+
+        Args:
+            digraph: the Digraph of the pool, with vertices labelled
+            ndds: a list of NDDs in the pool
+            ndd_labels: the label of each NDD in ndds
+            cycles: the cycles of the digraph up to the cycle cap, each a list
+                of Vertex objects
+        """
+
+        m = self.m
+        num_positions = max(self.max_chain - 1, 0)
+
+        for v in digraph.vs:
+            if v is not None and v.label not in self.capacity_constrs:
+                self._add(self.capacity_constrs, v.label, m.addConstr(quicksum([]) <= 1), [v.label])
+                self._add(self.flow_constrs, v.label,
+                          [m.addConstr(quicksum([]) >= 0) for __ in range(num_positions)], [v.label])
+
+        for c in cycles:
+            labels = [v.label for v in c]
+            min_index_pos = labels.index(min(labels))
+            key = tuple(labels[min_index_pos:] + labels[:min_index_pos])
+            if key not in self.cycle_vars:
+                column = Column([1.0] * len(key), [self.capacity_constrs[label] for label in key])
+                var = m.addVar(obj=cycle_score(c, digraph), vtype=GRB.BINARY, column=column)
+                self._add(self.cycle_vars, key, var, key)
+
+        if self.max_chain == 0:
+            return
+
+        for ndd_label, ndd in zip(ndd_labels, ndds):
+            if ndd_label not in self.ndd_constrs:
+                self._add(self.ndd_constrs, ndd_label, m.addConstr(quicksum([]) <= 1), [ndd_label])
+            for e in ndd.edges:
+                key = (ndd_label, e.target_v.label)
+                if key not in self.ndd_edge_vars:
+                    constrs = [self.ndd_constrs[ndd_label], self.capacity_constrs[e.target_v.label]]
+                    if self.max_chain > 1:
+                        constrs.append(self.flow_constrs[e.target_v.label][0])
+                    var = m.addVar(obj=e.score, vtype=GRB.BINARY, column=Column([1.0] * len(constrs), constrs))
+                    self._add(self.ndd_edge_vars, key, var, key)
+                e.edge_var = self.ndd_edge_vars[key]
+
+        for e in digraph.es:
+            key = (e.src.label, e.tgt.label)
+            if key not in self.edge_vars:
+                src_flow = self.flow_constrs[e.src.label]
+                tgt_flow = self.flow_constrs[e.tgt.label]
+                edge_vars = []
+                for i in range(num_positions):
+                    # The edge is at position i+1: it leaves e.src at position i and enters
+                    # e.tgt at position i+1
+                    coeffs = [1.0, -1.0]
+                    constrs = [self.capacity_constrs[e.tgt.label], src_flow[i]]
+                    if i < self.max_chain - 2:
+                        coeffs.append(1.0)
+                        constrs.append(tgt_flow[i+1])
+                    edge_vars.append(m.addVar(obj=e.score, vtype=GRB.BINARY, column=Column(coeffs, constrs)))
+                self._add(self.edge_vars, key, edge_vars, key)
+            e.grb_vars = self.edge_vars[key]
+
+    def optimise(self, digraph, ndds, ndd_labels, cycles):
+        """Update the model to the current pool and optimise it.
+
+        Args:
+            digraph, ndds, ndd_labels, cycles: as for update()
+
+        Returns:
+            an OptSolution object
+        """
+
+        self.update(digraph, ndds, ndd_labels, cycles)
+        self.m.optimize()
+
+        return OptSolution(ip_model=self.m,
+                           cycles=[[digraph.get_vertex(label) for label in key]
+                                   for key, var in self.cycle_vars.items() if var.x > 0.5],
+                           chains=[] if self.max_chain==0 else kidney_utils.get_optimal_chains(
+                                digraph, ndds),
+                           digraph=digraph)
+
 ###################################################################################################
 #                                                                                                 #
 #                                        Cycle formulation                                        #
@@ -587,10 +900,12 @@ def optimise_ccf(cfg):
         an OptSolution object
     """
 
-    cycles = cfg.digraph.find_cycles(cfg.max_cycle)
+    cycles = cfg.cycles
+    if cycles is None:
+        cycles = cfg.digraph.find_cycles(cfg.max_cycle, cfg.cycle_processes)
     chains = find_chains(cfg.digraph, cfg.ndds, cfg.max_chain, cfg.edge_success_prob)
         
-    m = create_ip_model(cfg.timelimit, cfg.verbose)
+    m = create_ip_model(cfg.timelimit, cfg.verbose, cfg.lp_file)
     m.params.method = 2
 
     cycle_vars = [m.addVar(vtype=GRB.BINARY) for __ in cycles]
@@ -627,6 +942,207 @@ def optimise_ccf(cfg):
                        digraph=cfg.digraph,
                        edge_success_prob=cfg.edge_success_prob)
 
+###################################################################################################
+#                                                                                                 #
+#                        Matrix construction (PICEF and cycle formulation)                        #
+#                                                                                                 #
+###################################################################################################
+
+# These build the constraint matrices with scipy.sparse in bulk and pass them to the solver through
+# its matrix interface (addMVar and addMConstr), rather than adding one quicksum expression per
+# constraint. The models are the same as those of optimise_picef and optimise_ccf.
+
+def cycle_arrays(cycles):
+    """Returns the vertex ids of the cycles concatenated, the index of the
+    cycle of each of those vertices, and the length of each cycle, as NumPy arrays.
+    """
+
+    lengths = np.fromiter((len(c) for c in cycles), dtype=np.intp, count=len(cycles))
+    vtx_ids = np.fromiter((v.id for c in cycles for v in c), dtype=np.intp, count=int(lengths.sum()))
+    cycle_ids = np.repeat(np.arange(len(cycles)), lengths)
+    return vtx_ids, cycle_ids, lengths
+
+def cycle_scores(cycles, digraph, edge_success_prob=1):
+    """Returns a NumPy array of the failure-aware score of each cycle."""
+
+    if not cycles:
+        return np.zeros(0)
+    vtx_ids, cycle_ids, lengths = cycle_arrays(cycles)
+    # The next vertex in each cycle, wrapping round to the first vertex
+    starts = np.cumsum(lengths) - lengths
+    next_ids = np.roll(vtx_ids, -1)
+    next_ids[starts + lengths - 1] = vtx_ids[starts]
+    src, tgt, scores = digraph.edge_arrays()
+    score_mat = scipy.sparse.csr_matrix((scores, (src, tgt)), shape=(len(digraph.vs), len(digraph.vs)))
+    edge_scores = np.asarray(score_mat[vtx_ids, next_ids]).ravel()
+    return (np.bincount(cycle_ids, weights=edge_scores, minlength=len(cycles)) *
+            float(edge_success_prob) ** lengths)
+
+def sparse_matrix(entries, shape):
+    """Returns a CSR matrix with empty rows removed.
+
+    Args:
+        entries: a list of (rows, cols, value), each setting the entries at
+            the positions given by the arrays rows and cols to value
+        shape: the shape of the matrix before empty rows are removed
+    """
+
+    A = scipy.sparse.csr_matrix((np.concatenate([np.full(len(rows), value, dtype=float)
+                                                 for rows, cols, value in entries]),
+                                 (np.concatenate([rows for rows, cols, value in entries]),
+                                  np.concatenate([cols for rows, cols, value in entries]))),
+                                shape=shape)
+    return A[A.getnnz(axis=1) > 0]
+
+def add_matrix_model(m, c, constraints):
+    """Add a vector of binary variables with objective coefficients c, and the
+    constraints A @ x <sense> b for each (A, sense, b) in constraints.
+
+    Returns:
+        the MVar of the variables
+    """
+
+    m.ModelSense = GRB.MAXIMIZE
+    x = m.addMVar(len(c), vtype=GRB.BINARY, obj=c)
+    for A, sense, b in constraints:
+        if A.shape[0] > 0:
+            m.addMConstr(A, x, sense, np.full(A.shape[0], b, dtype=float))
+    return x
+
+def build_picef_matrices(digraph, ndds, cycles, max_chain, edge_success_prob=1):
+    """Build the objective and constraint matrices of PICEF.
+
+    The variables are, in order: one per cycle, one per NDD edge, and one per
+    pair-to-pair edge and chain position at which the edge can be used.
+
+    Returns:
+        c: the objective coefficients
+        constraints: a list of (A, sense, b)
+        ndd_edges: the (ndd index, NddEdge) of each NDD edge variable
+        chain_src, chain_tgt: the source and target vertex ids of each chain edge variable
+    """
+
+    n = len(digraph.vs)
+    vtx_ids, cycle_ids, __ = cycle_arrays(cycles)
+    num_cycles = len(cycles)
+
+    ndd_edges = [(i, e) for i, ndd in enumerate(ndds) for e in ndd.edges] if max_chain > 0 else []
+    ndd_index = np.array([i for i, e in ndd_edges], dtype=np.intp)
+    ndd_tgt = np.array([e.target_v.id for i, e in ndd_edges], dtype=np.intp)
+    ndd_scores = np.array([e.score for i, e in ndd_edges], dtype=float) * edge_success_prob
+    ndd_cols = num_cycles + np.arange(len(ndd_edges))
+
+    if max_chain > 1:
+        src, tgt, scores = digraph.edge_arrays()
+        dists_from_ndd = np.array(kidney_utils.get_dist_from_nearest_ndd(digraph, ndds), dtype=np.intp)
+        # The edge can be used at position pos+1 if its source is within pos+1 edges of an NDD
+        pos, edge_ids = np.nonzero(dists_from_ndd[src][np.newaxis, :] <= np.arange(1, max_chain)[:, np.newaxis])
+        chain_src, chain_tgt = src[edge_ids], tgt[edge_ids]
+        chain_scores = scores[edge_ids] * float(edge_success_prob) ** (pos + 2)
+    else:
+        pos = chain_src = chain_tgt = np.zeros(0, dtype=np.intp)
+        chain_scores = np.zeros(0)
+    chain_cols = num_cycles + len(ndd_edges) + np.arange(len(chain_src))
+    num_vars = num_cycles + len(ndd_edges) + len(chain_src)
+
+    # Each vertex is in at most one selected cycle or chain edge, and each NDD in one chain
+    capacity = sparse_matrix([(vtx_ids, cycle_ids, 1), (ndd_tgt, ndd_cols, 1),
+                              (chain_tgt, chain_cols, 1), (n + ndd_index, ndd_cols, 1)],
+                             (n + len(ndds), num_vars))
+    constraints = [(capacity, GRB.LESS_EQUAL, 1)]
+
+    if max_chain > 1:
+        # At each chain position, sum of edges into a vertex must be >= sum of edges out
+        # (the row of vertex v at position pos is pos*n + v)
+        into_next = pos < max_chain - 2
+        flow = sparse_matrix([(ndd_tgt, ndd_cols, 1),
+                              ((pos[into_next] + 1) * n + chain_tgt[into_next], chain_cols[into_next], 1),
+                              (pos * n + chain_src, chain_cols, -1)],
+                             ((max_chain - 1) * n, num_vars))
+        constraints.append((flow, GRB.GREATER_EQUAL, 0))
+
+    c = np.concatenate([cycle_scores(cycles, digraph, edge_success_prob), ndd_scores, chain_scores])
+    return c, constraints, ndd_edges, chain_src, chain_tgt
+
+def optimise_picef_matrix(cfg):
+    """Optimise using the PICEF formulation, building the model in matrix form.
+
+    Args:
+        cfg: an OptConfig object
+
+    Returns:
+        an OptSolution object
+    """
+
+    cycles = cfg.cycles
+    if cycles is None:
+        cycles = cfg.digraph.find_cycles(cfg.max_cycle, cfg.cycle_processes)
+
+    m = create_ip_model(cfg.timelimit, cfg.verbose, cfg.lp_file)
+    m.params.method = 2
+
+    c, constraints, ndd_edges, chain_src, chain_tgt = build_picef_matrices(
+            cfg.digraph, cfg.ndds, cycles, cfg.max_chain, cfg.edge_success_prob)
+    x = add_matrix_model(m, c, constraints)
+    optimise(m, cfg)
+
+    selected = x.X > 0.5
+    cycle_selected = selected[:len(cycles)]
+    ndd_selected = selected[len(cycles):len(cycles) + len(ndd_edges)]
+    chain_selected = selected[len(cycles) + len(ndd_edges):]
+    chain_next_vv = dict(zip(chain_src[chain_selected].tolist(), chain_tgt[chain_selected].tolist()))
+
+    return OptSolution(ip_model=m,
+                       cycles=[c for c, s in zip(cycles, cycle_selected) if s],
+                       chains=kidney_utils.chains_from_selected_edges(
+                            cfg.digraph, [e for e, s in zip(ndd_edges, ndd_selected) if s],
+                            chain_next_vv, cfg.edge_success_prob),
+                       digraph=cfg.digraph,
+                       edge_success_prob=cfg.edge_success_prob)
+
+def optimise_ccf_matrix(cfg):
+    """Optimise using the cycle formulation, building the model in matrix form.
+
+    Args:
+        cfg: an OptConfig object
+
+    Returns:
+        an OptSolution object
+    """
+
+    cycles = cfg.cycles
+    if cycles is None:
+        cycles = cfg.digraph.find_cycles(cfg.max_cycle, cfg.cycle_processes)
+    chains = find_chains(cfg.digraph, cfg.ndds, cfg.max_chain, cfg.edge_success_prob)
+
+    m = create_ip_model(cfg.timelimit, cfg.verbose, cfg.lp_file)
+    m.params.method = 2
+
+    n = len(cfg.digraph.vs)
+    vtx_ids, cycle_ids, __ = cycle_arrays(cycles)
+    chain_lengths = np.fromiter((len(c.vtx_indices) for c in chains), dtype=np.intp, count=len(chains))
+    chain_vtx_ids = np.fromiter((v for c in chains for v in c.vtx_indices), dtype=np.intp,
+                                count=int(chain_lengths.sum()))
+    chain_cols = len(cycles) + np.arange(len(chains))
+    chain_ndds = np.fromiter((c.ndd_index for c in chains), dtype=np.intp, count=len(chains))
+
+    # Each donor-patient pair and each each NDD is in at most one chosen cycle or chain
+    A = sparse_matrix([(vtx_ids, cycle_ids, 1), (chain_vtx_ids, np.repeat(chain_cols, chain_lengths), 1),
+                       (n + chain_ndds, chain_cols, 1)],
+                      (n + len(cfg.ndds), len(cycles) + len(chains)))
+    c = np.concatenate([cycle_scores(cycles, cfg.digraph, cfg.edge_success_prob),
+                        np.array([chain.score for chain in chains], dtype=float)])
+
+    x = add_matrix_model(m, c, [(A, GRB.LESS_EQUAL, 1)])
+    optimise(m, cfg)
+
+    selected = x.X > 0.5
+    return OptSolution(ip_model=m,
+                       cycles=[c for c, s in zip(cycles, selected[:len(cycles)]) if s],
+                       chains=[c for c, s in zip(chains, selected[len(cycles):]) if s],
+                       digraph=cfg.digraph,
+                       edge_success_prob=cfg.edge_success_prob)
+
 ###################################################################################################
 #                                                                                                 #
 #                                    Extended Edge Formulation                                    # 
@@ -765,7 +1281,7 @@ def optimise_eef(cfg, full_red=False):
     if cfg.edge_success_prob != 1:
         raise ValueError("This formulation does not support failure-aware matching.")
 
-    m = create_ip_model(cfg.timelimit, cfg.verbose)
+    m = create_ip_model(cfg.timelimit, cfg.verbose, cfg.lp_file)
     m.params.method = 2
     m.params.presolve = 0
 
@@ -7,7 +7,7 @@ each of these edges points towards a vertex (which represents a donor-patient pa
 in the directed graph.
 """
 
-from algorithms.kidney_solver.kidney_digraph import KidneyReadException
+from algorithms.kidney_solver.kidney_digraph import KidneyReadException, read_edge_lines
 
 class Ndd:
     """A non-directed donor"""
@@ -37,37 +37,43 @@ def create_relabelled_ndds(ndds, old_to_new_vtx):
 
     return new_ndds
 
-def read_ndds(lines, digraph):
-    """Reads NDDs from an array of strings in the .ndd format."""
+def build_ndds(ndd_count, ndd_indices, tgt_ids, scores, digraph):
+    """Builds NDDs from arrays of NDD-to-pair edges.
+
+    Args:
+        ndd_count: the number of NDDs
+        ndd_indices: the index of the NDD that each edge leaves
+        tgt_ids: the id num of the vertex that each edge points to
+        scores: the score of each edge
+        digraph: the Digraph containing the target vertices
+    """
 
-    ndds = []
-    ndd_count, edge_count = [int(x) for x in lines[0].split()]
     ndds = [Ndd() for _ in range(ndd_count)]
 
     # Keep track of which edges have been created already so that we can
     # detect duplicates
-    edge_exists = [[False for v in digraph.vs] for ndd in ndds]
+    edge_exists = set()
 
-    for line in lines[1:edge_count+1]:
-        tokens = [t for t in line.split()]
-        src_id = int(tokens[0])
-        tgt_id = int(tokens[1])
-        score = float(tokens[2])
+    for src_id, tgt_id, score in zip(ndd_indices, tgt_ids, scores):
         if src_id < 0 or src_id >= ndd_count:
             raise KidneyReadException("NDD index {} out of range.".format(src_id))
-        if tgt_id < 0 or tgt_id > digraph.max_n:
+        if not digraph.has_vertex(tgt_id):
             raise KidneyReadException("Vertex index {} out of range.".format(tgt_id))
-        if edge_exists[src_id][tgt_id]:
+        if (src_id, tgt_id) in edge_exists:
             raise KidneyReadException(
                     "Duplicate edge from NDD {0} to vertex {1}.".format(src_id, tgt_id))
-        ndds[src_id].add_edge(NddEdge(digraph.vs[tgt_id], score))
-        edge_exists[src_id][tgt_id] = True
-
-    if lines[edge_count+1].split()[0] != "-1" or len(lines) < edge_count+2:
-        raise KidneyReadException("Incorrect edge count")
+        ndds[src_id].add_edge(NddEdge(digraph.get_vertex(tgt_id), float(score)))
+        edge_exists.add((src_id, tgt_id))
 
     return ndds
 
+def read_ndds(lines, digraph):
+    """Reads NDDs from an array of strings in the .ndd format."""
+
+    ndd_count = int(lines[0].split()[0])
+    ndd_indices, tgt_ids, scores = read_edge_lines(lines)
+    return build_ndds(ndd_count, ndd_indices, tgt_ids, scores, digraph)
+
 class Chain(object):
     """A chain initiated by an NDD.
     
@@ -111,18 +111,27 @@ def get_optimal_chains(digraph, ndds, edge_success_prob=1):
                         for e in digraph.es
                         for var in e.grb_vars
                         if var.x > 0.1}
-        
+    selected_ndd_edges = [(i, e) for i, ndd in enumerate(ndds) for e in ndd.edges if e.edge_var.x > 0.1]
+    return chains_from_selected_edges(digraph, selected_ndd_edges, chain_next_vv, edge_success_prob)
+
+def chains_from_selected_edges(digraph, selected_ndd_edges, chain_next_vv, edge_success_prob=1):
+    """Returns the chains of a solution, as a list of Chain objects.
+
+    Args:
+        selected_ndd_edges: a list of (ndd index, NddEdge) for the selected NDD edges
+        chain_next_vv: a dict from the id of each vertex with a selected out-edge
+            in a chain to the id of that edge's target
+    """
+
     optimal_chains = []
-    for i, ndd in enumerate(ndds):
-        for e in ndd.edges:
-            if e.edge_var.x > 0.1:
-                vtx_indices = find_selected_path(e.target_v.id, chain_next_vv)
-                # Get score of edge from NDD
-                score = e.score * edge_success_prob
-                # Add scores of edges between vertices
-                for j in range(len(vtx_indices) - 1):
-                    score += digraph.adj_mat[vtx_indices[j]][vtx_indices[j+1]].score * edge_success_prob**(j+2)
-                optimal_chains.append(kidney_ndds.Chain(i, vtx_indices, score))
+    for i, e in selected_ndd_edges:
+        vtx_indices = find_selected_path(e.target_v.id, chain_next_vv)
+        # Get score of edge from NDD
+        score = e.score * edge_success_prob
+        # Add scores of edges between vertices
+        for j in range(len(vtx_indices) - 1):
+            score += digraph.adj_mat[vtx_indices[j]][vtx_indices[j+1]].score * edge_success_prob**(j+2)
+        optimal_chains.append(kidney_ndds.Chain(i, vtx_indices, score))
     
     return optimal_chains
 
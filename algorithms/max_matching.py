@@ -1,11 +1,15 @@
-from config import ALGORITHM, PRINT
+from config import ALGORITHM, PRINT, SPARSE_DIGRAPH, CSR_DIGRAPH, INCREMENTAL_CYCLES, CYCLE_PROCESSES, \
+    INCREMENTAL_MODEL, MATRIX_MODEL, DECOMPOSE, COMPONENT_PROCESSES
 
+import logging
 import time
 import algorithms.kidney_solver.kidney_digraph as kidney_digraph
 import algorithms.kidney_solver.kidney_ip as kidney_ip
 import algorithms.kidney_solver.kidney_utils as kidney_utils
 import algorithms.kidney_solver.kidney_ndds as kidney_ndds
 
+logger = logging.getLogger(__name__)
+
 
 class MaxMatching:
     """
@@ -26,55 +30,94 @@ class MaxMatching:
         if ALGORITHM == "FAST":
             return self.FAST_maximum_matching()
 
+    def get_instance_edges(self, G, weights, altruist_list):
+        """
+        splits the edges of the market into pair-to-pair edges and altruist-to-pair edges
+        :param G: the adjacency list of the market, from Market.get_adj_list
+        :param weights: the edge weights of the market, from Market.get_adj_list
+        :param altruist_list: the id_nums of the altruists, from Market.get_alt_list
+        :return: two tuples of lists (src_ids, tgt_ids, scores) for the pair-to-pair edges
+                 and (ndd_indices, tgt_ids, scores) for the altruist edges, and the number of
+                 pairs which are not altruists
+        """
+        altruist_set = set(altruist_list)
+        src_ids, tgt_ids, scores = list(), list(), list()
+        num_pairs = 0
+        for key in G.keys():
+            if key in altruist_set:
+                continue
+            num_pairs += 1
+            for val in G[key]:
+                src_ids.append(key)
+                tgt_ids.append(val)
+                scores.append(weights[(key, val)])
+        ndd_indices, ndd_tgt_ids, ndd_scores = list(), list(), list()
+        for i, key in enumerate(altruist_list):
+            for val in G[key]:
+                ndd_indices.append(i)
+                ndd_tgt_ids.append(val)
+                ndd_scores.append(weights[(key, val)])
+        return (src_ids, tgt_ids, scores), (ndd_indices, ndd_tgt_ids, ndd_scores), num_pairs
+
+    def build_instance(self, G, weights, vertex_list, altruist_list):
+        """
+        builds the digraph and the altruists (NDDs) given to the kidney solver directly from the market
+        :return: a Digraph (or CsrDigraph) and a list of Ndds
+        """
+        (src_ids, tgt_ids, scores), ndd_edges, num_pairs = self.get_instance_edges(G, weights, altruist_list)
+        if CSR_DIGRAPH:
+            d = kidney_digraph.build_csr_digraph(vertex_list, src_ids, tgt_ids, scores)
+        else:
+            d = kidney_digraph.build_digraph(vertex_list, src_ids, tgt_ids, scores, sparse=SPARSE_DIGRAPH)
+        altruists = kidney_ndds.build_ndds(len(altruist_list), *ndd_edges, d)
+        return d, altruists
+
+    def export_instance(self, file_path):
+        """
+        writes the current market as a kidney_solver instance, for debugging
+        the pair-to-pair edges are written to file_path.input and the altruist edges to file_path.ndds
+        :param file_path: the path of the files to write, without extension
+        """
+        G, pair_dict, weights, vertex_list = self.bigraph.get_adj_list()
+        altruist_list = self.bigraph.get_alt_list()
+        digraph_edges, ndd_edges, num_pairs = self.get_instance_edges(G, weights, altruist_list)
+        with open(file_path + ".input", "w") as f:
+            f.writelines(kidney_digraph.write_edge_lines(num_pairs, *digraph_edges))
+        with open(file_path + ".ndds", "w") as f:
+            f.writelines(kidney_digraph.write_edge_lines(len(altruist_list), *ndd_edges))
+
     def FAST_maximum_matching(self):
         """
         finds a matching using a faster linear program -- kidney_solver_master
-        in the original algorithm, it takes input of 2 files: .input and .ndds
-        need to mimic files for both .input and .ndds from our model:P
-        digraph_lines <==> .input   &   ndd_lines <==> .ndds
+        the original algorithm takes input of 2 files: .input and .ndds
+        here the digraph and altruists are built directly from the market (see export_instance for the files)
         :return: a set of all the edges in the matching
         """
 
         G, pair_dict, weights, vertex_list = self.bigraph.get_adj_list()
         altruist_list = self.bigraph.get_alt_list()
-        print("Altruist in this period:", end=" ")
-        print(altruist_list)
-
-        # initialize .input
-        digraph_lines = list()
-        new_keys = list()  # a list of keys that excludes altruists
-        for key in G.keys():
-            if key in altruist_list:
-                continue
-            else:
-                new_keys.append(key)
-        temp_list = list()  # a list of all the neighbors of altruists
-        for alt in altruist_list:
-            for v in G[alt]:
-                temp_list.append(v)
-        digraph_lines.append(str(len(new_keys)) + "\t" + str(len(weights)-len(temp_list)) + "\n")
-        for key in new_keys:
-            for val in G[key]:
-                digraph_lines.append(str(key) + "\t" + str(val) + "\t" + str(weights[(key, val)]) + "\n")
-        digraph_lines.append(str(-1) + "\t" + str(-1) + "\t" + str(-1) + "\n")
-
-        d = kidney_digraph.read_digraph(digraph_lines, vertices=vertex_list)
-
-        #initialize .ndds
-        ndd_lines = list()
-        i = 0
-        ndd_lines.append(str(len(altruist_list)) + "\t" + str(len(temp_list)) + "\n")
-        for key in altruist_list:
-            for val in G[key]:
-                ndd_lines.append(str(i) + "\t" + str(val) + "\t" + str(weights[(key, val)]) + "\n")
-            i = i+1
-        ndd_lines.append(str(-1) + "\t" + str(-1) + "\t" + str(-1) + "\n")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("altruists in this period: %s", altruist_list)
 
-        altruists = kidney_ndds.read_ndds(ndd_lines, d)
+        d, altruists = self.build_instance(G, weights, vertex_list, altruist_list)
 
         start_time = time.time()
-        cfg = kidney_ip.OptConfig(d, altruists, self.max_cycle_size, self.max_path_size)
-        opt_solution = self.solve_kep(cfg, formulation="picef", use_relabelled=False)
+        cycles = None
+        if INCREMENTAL_CYCLES:
+            cycles = self.bigraph.cycle_index.get_cycles(d, self.max_cycle_size)
+        if INCREMENTAL_MODEL:
+            # the market's model only needs the new pairs, cycles and altruists added
+            if cycles is None:
+                cycles = d.find_cycles(self.max_cycle_size, CYCLE_PROCESSES)
+            opt_solution = self.bigraph.picef_model.optimise(d, altruists, altruist_list, cycles)
+            kidney_utils.check_validity(opt_solution, d, altruists, self.max_cycle_size, self.max_path_size)
+            opt_solution.formulation_name = "PICEF"
+        else:
+            cfg = kidney_ip.OptConfig(d, altruists, self.max_cycle_size, self.max_path_size, cycles=cycles,
+                                      cycle_processes=CYCLE_PROCESSES)
+            opt_solution = self.solve_kep(cfg, formulation="picef_matrix" if MATRIX_MODEL else "picef",
+                                          use_relabelled=False, decompose=DECOMPOSE,
+                                          processes=COMPONENT_PROCESSES)
         time_taken = time.time() - start_time
         if (PRINT):
             print("formulation: PICEF")
@@ -87,7 +130,6 @@ class MaxMatching:
             print(("solver_status: {}".format(opt_solution.ip_model.status)))
             print(("total_score: {}".format(opt_solution.total_score)))
         cycles, chains = opt_solution.display(altruist_list)  # Note that in each chain array, altruist is excluded
-        print("-------------------------------------------------------")
         edges = set()
         preserved_donors = set()  # preserve the donor of last pair in a chain
         cycle_path_lengths = [[0, 0, 0, 0, 0], [0], [0, 0, 0, 0, 0]]  # cycle matches by size, path matches, path matches by size (0-5, 6-10, 11-15, 16-20, 21+)
@@ -148,7 +190,17 @@ class MaxMatching:
         self.cycle_lengths = cycle_path_lengths
         return edges, preserved_donors
 
-    def solve_kep(cfg, formulation, use_relabelled=True):
+    @staticmethod
+    def solve_kep(cfg, formulation, use_relabelled=True, decompose=False, processes=1):
+        """
+        solves a kidney exchange instance
+        :param cfg: an OptConfig
+        :param formulation: the name of the IP formulation
+        :param use_relabelled: solve on a copy of the digraph with vertices sorted by degree
+        :param decompose: solve each strongly connected component separately (ignored if use_relabelled is set)
+        :param processes: the number of processes used to solve the components when decompose is set
+        :return: an OptSolution
+        """
         formulations = {
             "uef": ("Uncapped edge formulation", kidney_ip.optimise_uuef),
             "eef": ("EEF", kidney_ip.optimise_eef),
@@ -160,13 +212,17 @@ class MaxMatching:
             "hpief_2prime_full_red": (
             "HPIEF'' with full reduction by cycle generation", kidney_ip.optimise_hpief_2prime_full_red),
             "picef": ("PICEF", kidney_ip.optimise_picef),
-            "cf": ("Cycle formulation", kidney_ip.optimise_ccf)
+            "picef_matrix": ("PICEF", kidney_ip.optimise_picef_matrix),
+            "cf": ("Cycle formulation", kidney_ip.optimise_ccf),
+            "cf_matrix": ("Cycle formulation", kidney_ip.optimise_ccf_matrix)
         }
 
         if formulation in formulations:
             formulation_name, formulation_fun = formulations[formulation]
             if use_relabelled:
                 opt_result = kidney_ip.optimise_relabelled(formulation_fun, cfg)
+            elif decompose:
+                opt_result = kidney_ip.optimise_decomposed(formulation_fun, cfg, processes)
             else:
                 opt_result = formulation_fun(cfg)
             kidney_utils.check_validity(opt_result, cfg.digraph, cfg.ndds, cfg.max_cycle, cfg.max_chain)
@@ -49,6 +49,10 @@ DATA_PATH = "data"
 
 # enable or disable random sample of population, particularly for the number of altruist per period
 RANDOM_SAMPLE = True
+# generate each period's pairs with array operations, drawing each attribute for a block of candidate pairs at once
+# (this draws the same distributions in a different order, so results for a given seed differ from the one pair at
+# a time generation)
+BATCH_POPULATION = False
 
 #kpd arrival rate is 37
 ARRIVAL_RATE = 37
@@ -77,16 +81,54 @@ REUSE_RATE = 0
 LEARNING_RATE = 0.5
 
 
+# keep a networkx graph of the market up to date as participants are added and removed
+# if False, the graph is only built when it is used (by Market.draw_market, get_adj_list2 or Market.graph)
+NETWORKX_GRAPH = False
+
 # matching algorithm used
 # 'FAST' for LP with faster cycle selection
 ALGORITHM = "FAST"
 
+# store the digraph given to the matching algorithm sparsely, with pair id nums remapped to 0..n-1
+# the dense digraph allocates a (max id num)^2 adjacency matrix, and id nums keep growing over the periods
+SPARSE_DIGRAPH = True
+# store the digraph in compressed sparse row arrays, with no Python object per edge (takes priority over SPARSE_DIGRAPH)
+# use this for very large pools, where the object-per-edge digraph dominates memory
+CSR_DIGRAPH = False
+# keep the cycles of the market between periods and only enumerate the cycles through newly added pairs
+INCREMENTAL_CYCLES = True
+# number of processes used to find all the cycles when INCREMENTAL_CYCLES is False (1 to search in this process)
+CYCLE_PROCESSES = 1
+# keep one PICEF model for the whole simulation, adding and removing only the variables and constraints
+# of pairs, cycles and altruists that have arrived or left, instead of building a new model each period
+INCREMENTAL_MODEL = False
+# build each period's IP as sparse matrices in bulk, instead of one constraint expression at a time
+MATRIX_MODEL = True
+# split each period's IP into one subproblem per strongly connected component of the market (with all the
+# pairs reachable from an altruist in one subproblem), and solve them separately
+DECOMPOSE = False
+# number of processes used to solve the subproblems when DECOMPOSE is set (1 to solve them in this process)
+COMPONENT_PROCESSES = 1
+# number of worker processes used by testaltruists to run the seed trials (1 to run them one at a time)
+# each trial runs in its own process, so TRIAL_TIMEOUT and the handling of crashed trials apply whatever the number
+TRIAL_PROCESSES = 1
+# time limit of each seed trial in seconds (None for no limit)
+# a trial which runs out of time, or whose worker process crashes, is recorded as failed and the other trials go on
+TRIAL_TIMEOUT = None
+
+# the MILP solver used by the matching algorithm
+# 'GUROBI' (needs a Gurobi licence) or 'HIGHS' for the open-source HiGHS solver, through scipy
+MILP_SOLVER = "GUROBI"
+
 # edge weights used
 # either 'KPD' for the current Canadian KPD weights, 'OPT' for the optimized weights, or when training optimized weights, 'CONST' for constant weights
 WEIGHTS = "KPD"
 
 # An indicator for printing the ip solver characters
 PRINT = False
+# the level of the log messages of the simulation scripts: 'WARNING' for quiet batch runs, 'INFO' for one summary
+# record per period, or 'DEBUG' for the altruists, vertices and wait times of every period
+LOG_LEVEL = "WARNING"
 
 
 # Learned weights here
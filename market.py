@@ -1,12 +1,26 @@
+import logging
 import networkx as nx
 import matplotlib.pyplot as plt
 import numpy as np
 import numpy.random as random
-from config import PERIOD_LENGTH, PERISH, WEIGHTS, ALGORITHM, REUSE_RATE,TIME_TO_CRITICAL_LOW,ALT_WEIGHT, START_SIZE,ARRIVAL_RATE, NUM_PERIODS
+from config import PERIOD_LENGTH, PERISH, WEIGHTS, ALGORITHM, REUSE_RATE,TIME_TO_CRITICAL_LOW,ALT_WEIGHT, START_SIZE,ARRIVAL_RATE, NUM_PERIODS, INCREMENTAL_MODEL, NETWORKX_GRAPH
 import algorithms.max_matching as mm
+from algorithms.cycle_index import CycleIndex
+from algorithms.kidney_solver.kidney_ip import IncrementalPicefModel
 import market_metrics as met
 from participant import Participant
-import statistics
+from participant_table import BLOOD_TYPE_CODES
+import heapq
+
+logger = logging.getLogger(__name__)
+
+# the recipient blood types that a donor of each blood type can give to
+ABO_RECIPIENTS = {'O': ('O', 'A', 'B', 'AB'), 'A': ('A', 'AB'), 'B': ('B', 'AB'), 'AB': ('AB',)}
+# the donor blood types that a recipient of each blood type can receive from
+ABO_DONORS = {'O': ('O',), 'A': ('A', 'O'), 'B': ('B', 'O'), 'AB': ('AB', 'A', 'B', 'O')}
+# ABO_MATRIX[d, r] is True if a donor with blood type code d is ABO compatible with a recipient with blood type code r
+ABO_MATRIX = np.array([[donor in ABO_DONORS.get(recipient, ()) for recipient in BLOOD_TYPE_CODES]
+                       for donor in BLOOD_TYPE_CODES])
 
 
 class Market:
@@ -15,27 +29,87 @@ class Market:
     Participants are the nodes of the graph and edges represent potential kidney exchanges
     Attributes
     ----------
-    participants: list<(Participant, Participant)>
-        a list of all the participants in the market
-    graph: Digraph
-        a networkx directed graph
+    participants: dict<Participant, None>
+        all the participants in the market, in the order in which they entered (a dict is used as an ordered set)
+    graph: DiGraph
+        a networkx directed graph of the market
+        it is kept up to date in nx_graph if NETWORKX_GRAPH is set, and otherwise built from the participants each time
+        it is accessed (e.g. by draw_market)
+    nx_graph: DiGraph
+        the networkx directed graph kept up to date as participants are added and removed, or None
     metrics: Metrics
         a Metrics instance, which tracks all the stats for the market
     altruists: list<(Participant, Participant)>
         a list of all the altruists in the market
+    cycle_index: CycleIndex
+        the cycles of the market, kept up to date as pairs are added and removed
+    donor_buckets: dict<str, dict<Participant, int>>
+        for each blood type, the donors in the market with that blood type, mapped to the order in which they entered
+    recipient_buckets: dict<str, dict<Participant, int>>
+        for each blood type, the recipients in the market with that blood type (excluding the "fake participants"
+        of altruists), mapped to the order in which they entered
+    picef_model: IncrementalPicefModel
+        the matching IP, kept up to date as pairs are added and removed, or None if INCREMENTAL_MODEL is not set
+    adj_list: dict<int, dict<int, None>>
+        for the id_num of each donor in the market, the id_nums of the recipients it points to, in the order of
+        the donor's neighbours (a dict is used as an ordered set)
+    edge_weights: dict<(int, int), float>
+        the weight of each donor-recipient edge, keyed by (donor id_num, recipient id_num)
+        weights only depend on the donor and the recipient, so each is calculated once, when the edge is added
+    pair_dict: dict<int, Participant>
+        the donor of each id_num, in the order in which the donors entered
+    vertex_counts: dict<int, int>
+        for each id_num, the number of participants in the market with that id_num
+    tables: dict<ParticipantTable, None>
+        the tables of the participants that have entered the market, which record when the participants enter and
+        leave, so that time can be advanced for all the participants in the market at once by advancing their clocks
+    clock: int
+        the total time that has passed in the market
+    deadlines: list<(int, int, Participant)>
+        if PERISH is set, a heap of (clock at which the participant perishes, order in which it entered, participant)
+        entries for the participants that have entered the market, including some that have since been removed
+    random_state: RandomState
+        the random numbers used to decide whether donors and recipients are compatible
+    altruist_random_state: RandomState
+        the random numbers used to decide whether preserved donors become altruists
+    perish_random_state: RandomState
+        the random numbers used to draw the time_to_critical of preserved donors that become altruists
     """
 
-    def __init__(self, pairs, num_altruists, per_period, weights=None, run_num=-1, max_cycle_size=3, max_path_size=3):
-        self.random_state = random.RandomState()
-        self.graph = nx.DiGraph()
-        self.participants = list()
+    def __init__(self, pairs, num_altruists, per_period, weights=None, run_num=-1, max_cycle_size=3, max_path_size=3,
+                 random_state=None, altruist_random_state=None, perish_random_state=None):
+        """
+        :param random_state: the RandomState used to decide compatibility, or None for a new unseeded one
+        :param altruist_random_state: the RandomState used to decide whether preserved donors become altruists,
+        or None for the global numpy one
+        :param perish_random_state: the RandomState used to draw the time_to_critical of preserved donors that
+        become altruists, or None for the global numpy one
+        """
+        self.random_state = random.RandomState() if random_state is None else random_state
+        self.altruist_random_state = random if altruist_random_state is None else altruist_random_state
+        self.perish_random_state = random if perish_random_state is None else perish_random_state
+        self.nx_graph = nx.DiGraph() if NETWORKX_GRAPH else None
+        self.participants = dict()
+        self.donor_buckets = {blood_type: dict() for blood_type in ABO_RECIPIENTS}
+        self.recipient_buckets = {blood_type: dict() for blood_type in ABO_DONORS}
+        self.num_entered = 0
+        self.adj_list = dict()
+        self.edge_weights = dict()
+        self.pair_dict = dict()
+        self.vertex_counts = dict()
+        self.tables = dict()
+        self.clock = 0
+        self.deadlines = list()
+        self.cycle_index = CycleIndex()
+        self.picef_model = None
+        if INCREMENTAL_MODEL:
+            self.picef_model = IncrementalPicefModel(max_cycle_size, max_path_size)
         self.metrics = met.Metrics(num_altruists=num_altruists, per_period=per_period, weights=weights, run_num=run_num, max_cycle_size=max_cycle_size, max_path_size=max_path_size)
-        for (recipient, donor) in pairs:
-            self.add_pair((recipient, donor))
+        self.add_pairs(pairs)
         self.altruists = list()
         self.num_added = 0
         self.total_wait_time = 0
-        self.wait_times = list()
+        self.wait_times = met.WaitTimeStats()
         self.max_cycle_size = max_cycle_size
         self.max_path_size = max_path_size
 
@@ -55,13 +129,7 @@ class Market:
         for match in matches:
             if match[0].blood_type == 'X':
                 num_altruists_in_matching += 1
-        median = 0
-        if len(self.wait_times) > 0:
-            median = statistics.median(self.wait_times)
-            print("THE median is " + str(median))
-            print(self.wait_times)
-            print("-----------------------------------------------------")
-            print()
+        median = self.wait_times.median()
         if ALGORITHM == "HA":
             num_matches = len(matches) - num_altruists_in_matching
         else:
@@ -72,22 +140,24 @@ class Market:
         # preserved donor becomes new altruists
         if REUSE_RATE != 0:
             for donor in preserved_donors:
-                use = np.random.choice([False, True], p=[1-REUSE_RATE, REUSE_RATE])
+                use = self.altruist_random_state.choice([False, True], p=[1-REUSE_RATE, REUSE_RATE])
                 if not use:
                    continue
                 donor.altruist = True
-                time_to_critical = int(np.random.poisson(lam=TIME_TO_CRITICAL_LOW, size=1))
+                time_to_critical = int(self.perish_random_state.poisson(lam=TIME_TO_CRITICAL_LOW))
                 recipient = Participant(donor.id_num, blood_type='X', donor=False, recipient=True, altruist = True,
-                                       time_to_critical=time_to_critical, weight=ALT_WEIGHT, cpra=0, dialysis_days=0)
+                                       time_to_critical=time_to_critical, weight=ALT_WEIGHT, cpra=0, dialysis_days=0,
+                                       table=donor.table)
                 new_altruist = (recipient,donor)
                 new_altruists.append(new_altruist)
         self.update(added_pairs=new_participants, matched_pairs=matches, altruists=list(),update_time = True)
         self.num_added = len(new_participants)
         total_unmatched_time = 0
         if period_num + 1 == NUM_PERIODS:
-            for p in self.participants:
-                if p.recipient and p.blood_type != "X":
-                    total_unmatched_time += p.time_in_market
+            for table in self.tables:
+                rows = table.rows_in_market()
+                waiting = ~table.donor[rows] & (table.blood_type[rows] != BLOOD_TYPE_CODES['X'])
+                total_unmatched_time += int(table.current_time_in_market(rows)[waiting].sum())
 
         # update table
         if trial_table is None:
@@ -103,7 +173,13 @@ class Market:
                                       trial_num = test_trial_num, cycle_lengths=cycle_path_lengths,
                                       wait_times=self.wait_times, trial_table=trial_table)
 
-        print("There remains {} pairs in the market (excluding altruists)".format(len(self.participants)/2))
+        if logger.isEnabledFor(logging.INFO):
+            summary = {"period": period_num, "matches": num_matches, "altruists_in_matching": num_altruists_in_matching,
+                       "pairs": len(self.participants) / 2, "altruists": len(self.altruists),
+                       "matched_recipients": len(self.wait_times), "median_wait_time": self.wait_times.median(),
+                       "mean_wait_time": self.wait_times.mean(), "p90_wait_time": self.wait_times.quantile(0.9)}
+            # the summary is also attached to the record, for handlers that write structured logs
+            logger.info("period summary: %s", summary, extra={"period_summary": summary})
 
         return cycle_path_lengths
 
@@ -112,50 +188,134 @@ class Market:
         adds a participant to the market
         :param participant: a participant to add to the market
         """
-        if not (participant in list(self.graph.nodes())):
+        if participant not in self.participants:
             self.add_node_to_graph(participant)
         if participant.donor:
-            for p in self.participants:
-                if p.recipient and participant.compatible(p,self.random_state) and (not participant.partner == p):
-                    participant.add_neighbour(p)
-                    weight = p.weight
-                    # penalize for altruist-patient edge
-                    if participant.altruist:
-                        weight = weight + ALT_WEIGHT
-                    if WEIGHTS == "KPD":
-                        weight = calculate_kpd_weight(donor=participant, recipient=p)
-                        if participant.altruist:
-                            print("altruist weight is = ", weight)
-                    # weight is determined by the recipient when determining who to match
-                    self.graph.add_weighted_edges_from([(participant, p, weight)])
+            for p in self.abo_candidates(participant):
+                if participant.compatible(p,self.random_state) and (not participant.partner == p):
+                    self.add_edge(participant, p)
         # participant is patient
         else:
-            for p in self.participants:
-                if participant.blood_type == "X":
-                    break
-                if p.donor and participant.compatible(p, self.random_state) and (not participant.partner == p):
-                    p.add_neighbour(participant)
-                    weight = participant.weight
-                    # penalize for altruist-patient edge
-                    if p.altruist:
-                        weight = weight + ALT_WEIGHT
-                    if WEIGHTS == "KPD":
-                        weight = calculate_kpd_weight(donor=p, recipient=participant)
-                        if p.altruist:
-                            print("altruist weight is = ", weight)
-                    # weight is determined by the recipient when determining who to match
-                    self.graph.add_weighted_edges_from([(p, participant, weight)])
+            for p in self.abo_candidates(participant):
+                if participant.compatible(p, self.random_state) and (not participant.partner == p):
+                    self.add_edge(p, participant)
 
-    def add_node_to_graph(self, participant):
+    def add_edge(self, donor, recipient):
+        """
+        adds an edge from a donor to a recipient, and records it in adj_list and edge_weights
+        :param donor: a donor Participant in the market
+        :param recipient: a recipient Participant in the market
+        """
+        donor.add_neighbour(recipient)
+        weight = self.edge_weight(donor, recipient)
+        self.adj_list[donor.id_num][recipient.id_num] = None
+        self.edge_weights[(donor.id_num, recipient.id_num)] = weight
+        if self.nx_graph is not None:
+            self.nx_graph.add_weighted_edges_from([(donor, recipient, weight)])
+
+    def remove_edge(self, donor, recipient):
+        """
+        removes the edge from a donor to a recipient, and drops it from adj_list and edge_weights
+        :param donor: a donor Participant in the market
+        :param recipient: a recipient Participant that the donor points to
+        """
+        donor.remove_neighbour(recipient)
+        self.adj_list[donor.id_num].pop(recipient.id_num, None)
+        self.edge_weights.pop((donor.id_num, recipient.id_num), None)
+
+    def edge_weight(self, donor, recipient):
+        """
+        calculates the weight of the edge from a donor to a recipient
+        :param donor: a donor Participant
+        :param recipient: a recipient Participant
+        :return: the weight
+        """
+        # weight is determined by the recipient when determining who to match
+        weight = recipient.weight
+        # penalize for altruist-patient edge
+        if donor.altruist:
+            weight = weight + ALT_WEIGHT
+        if WEIGHTS == "KPD":
+            weight = calculate_kpd_weight(donor=donor, recipient=recipient)
+            if donor.altruist:
+                logger.debug("altruist weight is %s", weight)
+        return weight
+
+    def abo_candidates(self, participant):
+        """
+        finds the participants that could be at the other end of an edge to or from the participant
+        these are the recipients that a donor is ABO compatible with, or the donors that a recipient is
+        ABO compatible with, so that tissue-type compatibility is only drawn for ABO compatible participants
+        :param participant: a participant in the market
+        :return: an iterator over the candidates, in the order in which they entered the market
+        """
+        if participant.donor:
+            buckets = [self.recipient_buckets[blood_type] for blood_type in ABO_RECIPIENTS[participant.blood_type]]
+        else:
+            buckets = [self.donor_buckets[blood_type] for blood_type in ABO_DONORS.get(participant.blood_type, ())]
+        return in_entry_order(buckets)
+
+    @property
+    def graph(self):
+        """
+        :return: the networkx directed graph of the market (nx_graph, or a newly built graph if it is not kept)
+        """
+        if self.nx_graph is not None:
+            return self.nx_graph
+        return self.build_graph()
+
+    def build_graph(self):
+        """
+        builds a networkx directed graph of the market from the participants and their neighbours
+        :return: the graph, with the same nodes, edges and weights as nx_graph would have
+        """
+        graph = nx.DiGraph()
+        for participant in self.participants:
+            self.add_graph_node(graph, participant)
+        for participant in self.participants:
+            if participant.donor:
+                graph.add_weighted_edges_from([(participant, p, self.edge_weights[(participant.id_num, p.id_num)])
+                                               for p in participant.neighbours])
+            else:
+                graph.add_weighted_edges_from([(participant, p, 1) for p in participant.neighbours])
+        return graph
+
+    @staticmethod
+    def add_graph_node(graph, participant):
         """
-        adds a participant to the networkx bipartite graph
+        adds a participant to a networkx bipartite graph
+        :param graph: a networkx DiGraph
         :param participant: participant to add to the graph
         """
         if participant.donor:
-            self.graph.add_nodes_from([participant], bipartite=1)
+            graph.add_nodes_from([participant], bipartite=1)
         elif participant.recipient:
-            self.graph.add_nodes_from([participant], bipartite=0)
-        self.participants.append(participant)
+            graph.add_nodes_from([participant], bipartite=0)
+
+    def add_node_to_graph(self, participant):
+        """
+        adds a participant to the market's participants and, if NETWORKX_GRAPH is set, to the networkx bipartite graph
+        :param participant: participant to add to the graph
+        """
+        if self.nx_graph is not None:
+            self.add_graph_node(self.nx_graph, participant)
+        self.participants[participant] = None
+        participant.table.enter_market(participant.row)
+        self.tables[participant.table] = None
+        self.vertex_counts[participant.id_num] = self.vertex_counts.get(participant.id_num, 0) + 1
+        if participant.donor:
+            self.donor_buckets[participant.blood_type][participant] = self.num_entered
+            self.adj_list[participant.id_num] = dict()
+            self.pair_dict[participant.id_num] = participant
+        elif participant.blood_type in self.recipient_buckets:
+            self.recipient_buckets[participant.blood_type][participant] = self.num_entered
+        if PERISH:
+            # time_in_market reaches time_to_critical once the clock has advanced by the difference (a participant
+            # which has just entered has its time in market in its row, without any time derived from the clock)
+            time_in_market = participant.table.time_in_market[participant.row].item()
+            deadline = self.clock + participant.time_to_critical - time_in_market
+            heapq.heappush(self.deadlines, (deadline, self.num_entered, participant))
+        self.num_entered += 1
 
     def remove_participant(self, participant):
         """
@@ -167,29 +327,41 @@ class Market:
             return
         if participant.donor:
             # only update metrics for donors, so we don't update more than once
-            self.metrics.update_blood_type_composition((participant.partner, participant), remove=True)
-            self.metrics.update_cpra_composition((participant.partner, participant), remove=True)
-            for p in self.participants:
-                if p.recipient:
-                    participant.remove_neighbour(p)
+            self.metrics.update_compositions([(participant.partner, participant)], remove=True)
+            for p in list(participant.neighbours):
+                self.remove_edge(participant, p)
+            del self.adj_list[participant.id_num]
+            del self.pair_dict[participant.id_num]
             if (participant.partner, participant) in self.altruists:
                 self.altruists.remove((participant.partner, participant))
         else:
-            for p in self.participants:
+            for p in list(participant.in_neighbours):
                 if p.donor:
-                    p.remove_neighbour(participant)
+                    self.remove_edge(p, participant)
             if (participant, participant.partner) in self.altruists:
                 self.altruists.remove((participant, participant.partner))
-        if participant in self.graph.nodes():
-            self.graph.remove_node(participant)
-        self.participants.remove(participant)
+        if self.nx_graph is not None and participant in self.nx_graph:
+            self.nx_graph.remove_node(participant)
+        del self.participants[participant]
+        participant.table.leave_market(participant.row)
+        self.vertex_counts[participant.id_num] -= 1
+        if self.vertex_counts[participant.id_num] == 0:
+            del self.vertex_counts[participant.id_num]
+        if participant.donor:
+            self.donor_buckets[participant.blood_type].pop(participant)
+        else:
+            self.recipient_buckets.get(participant.blood_type, dict()).pop(participant, None)
+        self.cycle_index.remove_vertex(participant.id_num)
+        if self.picef_model is not None:
+            self.picef_model.remove_vertex(participant.id_num)
 
     def draw_market(self):
-        if len(self.graph.nodes()) > 0:
-            graph_pos = nx.spring_layout(self.graph, k=(1 / (0.9 * np.sqrt(len(
-                self.graph.nodes())))))
+        graph = self.graph
+        if len(graph.nodes()) > 0:
+            graph_pos = nx.spring_layout(graph, k=(1 / (0.9 * np.sqrt(len(
+                graph.nodes())))))
         else:
-            graph_pos = nx.spring_layout(self.graph, k=0)
+            graph_pos = nx.spring_layout(graph, k=0)
         plt.clf()
         plt.axis('off')
         my_labels = {}
@@ -202,7 +374,7 @@ class Market:
                 colours.append('g')
             else:
                 colours.append('b')
-        nx.draw_networkx(self.graph, pos=graph_pos, with_labels=True, node_size=1000, node_color=colours, labels=my_labels,
+        nx.draw_networkx(graph, pos=graph_pos, with_labels=True, node_size=1000, node_color=colours, labels=my_labels,
                          font_size=7.5, font_weight='bold')
         plt.show()
 
@@ -213,14 +385,88 @@ class Market:
         :param recipient: Participant - the recipient of the patient-donor pair
         :param donor: Participant - the donor of the patient-donor pair
         """
+        self.cycle_index.add_vertex(pair[0].id_num)
         pair[0].add_neighbour(pair[1])
         pair[0].partner = pair[1]
         pair[1].partner = pair[0]
         self.add_participant(pair[1])
         self.add_participant(pair[0])
-        self.graph.add_weighted_edges_from([(pair[0], pair[1], 1)])
-        self.metrics.update_blood_type_composition(pair, remove=False)
-        self.metrics.update_cpra_composition(pair, remove=False)
+        if self.nx_graph is not None:
+            self.nx_graph.add_weighted_edges_from([(pair[0], pair[1], 1)])
+        self.metrics.update_compositions([pair], remove=False)
+
+    def add_pairs(self, pairs):
+        """
+        adds a batch of patient-donor pairs to the market
+        this gives the same market as calling add_pair on each pair in turn, using the same random draws,
+        but the ABO compatibility of all the candidate edges is found with array operations and all their
+        tissue-type compatibility draws are made at once
+        :param pairs: a list of tuples of participants in the form (recipient, donor), which are not in the market
+        """
+        if len(pairs) == 0:
+            return
+        old_donors = list(in_entry_order(self.donor_buckets.values()))
+        old_recipients = list(in_entry_order(self.recipient_buckets.values()))
+
+        for (recipient, donor) in pairs:
+            self.cycle_index.add_vertex(recipient.id_num)
+            recipient.add_neighbour(donor)
+            recipient.partner = donor
+            donor.partner = recipient
+            for participant in (donor, recipient):
+                if participant not in self.participants:
+                    self.add_node_to_graph(participant)
+            if self.nx_graph is not None:
+                self.nx_graph.add_weighted_edges_from([(recipient, donor, 1)])
+
+        self.metrics.update_compositions(pairs, remove=False)
+
+        donors = old_donors + [donor for (recipient, donor) in pairs]
+        recipients = old_recipients + [recipient for (recipient, donor) in pairs]
+        donor_types = np.array([BLOOD_TYPE_CODES[p.blood_type] for p in donors], dtype=int)
+        recipient_types = np.array([BLOOD_TYPE_CODES[p.blood_type] for p in recipients], dtype=int)
+        cpras = np.array([p.cpra for p in recipients], dtype=float)
+        num_old_donors, num_old_recipients, k = len(old_donors), len(old_recipients), len(pairs)
+
+        # the candidates that add_pair would test, in the order it would test them:
+        # the donor of pair i is tested against the old recipients, then the new recipients of the pairs before it
+        # the recipient of pair i is tested against the old donors, then the new donors of the pairs up to its own
+        new_abo = ABO_MATRIX[donor_types[num_old_donors:]][:, recipient_types[num_old_recipients:]]
+        donor_candidates = np.hstack([ABO_MATRIX[donor_types[num_old_donors:]][:, recipient_types[:num_old_recipients]],
+                                      np.tril(new_abo, -1)])
+        recipient_candidates = np.hstack([ABO_MATRIX[donor_types[:num_old_donors]][:, recipient_types[num_old_recipients:]].T,
+                                          np.tril(new_abo.T)])
+
+        # one draw per candidate, made in the order donor 0, recipient 0, donor 1, recipient 1, ...
+        counts = np.column_stack([donor_candidates.sum(axis=1), recipient_candidates.sum(axis=1)]).ravel()
+        starts = np.cumsum(counts) - counts
+        draws = self.random_state.random_sample(int(counts.sum()))
+
+        donor_ids, recipient_ids = list(), list()
+        for candidates, row_starts, is_donor_row in ((donor_candidates, starts[0::2], True),
+                                                     (recipient_candidates, starts[1::2], False)):
+            rows, cols = np.nonzero(candidates)
+            row_counts = candidates.sum(axis=1)
+            position = np.arange(len(rows)) - (np.cumsum(row_counts) - row_counts)[rows]
+            if is_donor_row:
+                donor_index, recipient_index = num_old_donors + rows, cols
+            else:
+                donor_index, recipient_index = cols, num_old_recipients + rows
+            # Participant.compatible returns random_state.choice([False, True], p=[cpra, 1 - cpra]),
+            # which is True when the draw is at least cpra / (cpra + (1 - cpra))
+            cpra = cpras[recipient_index]
+            compatible = draws[row_starts[rows] + position] >= cpra / (cpra + (1 - cpra))
+            # the recipient of a pair is tested against its own donor, but never given that edge
+            compatible &= ~((not is_donor_row) & (donor_index == num_old_donors + rows))
+            donor_ids.append(donor_index[compatible])
+            recipient_ids.append(recipient_index[compatible])
+
+        donor_ids = np.concatenate(donor_ids)
+        recipient_ids = np.concatenate(recipient_ids)
+        # a donor's neighbours are in the order in which the recipients entered the market
+        order = np.lexsort((donor_ids, recipient_ids))
+        for d, r in zip(donor_ids[order].tolist(), recipient_ids[order].tolist()):
+            self.add_edge(donors[d], recipients[r])
 
     def get_adj_list2(self):
         """
@@ -247,16 +493,37 @@ class Market:
                     B.add_weighted_edges_from([(participant, neighbour, 1)])
         return B
 
+    def times_in_market(self, participants):
+        """
+        reads the current time in market of participants with one array operation per table, rather than one
+        read of time_in_market per participant
+        :param participants: a list of participants
+        :return: a list of the times in market of the participants
+        """
+        times = [0] * len(participants)
+        for table in self.tables:
+            indices = [i for i, p in enumerate(participants) if p.table is table]
+            if len(indices) > 0:
+                rows = np.array([participants[i].row for i in indices])
+                for i, time in zip(indices, table.current_time_in_market(rows).tolist()):
+                    times[i] = time
+        return times
+
     def remove_perished(self):
         """
         removes pairs from the market that have been in the market for their time_to_critical amount of time
+        only the deadlines that have passed are popped, and entries of participants that are no longer in the
+        market (or have re-entered it since) are skipped
         """
-        participants = self.participants
-        perished = list()
-        for p in participants:
-            if p.time_in_market >= p.time_to_critical:
-                perished.append(p)
-        for p in perished:
+        candidates = dict()
+        while len(self.deadlines) > 0 and self.deadlines[0][0] <= self.clock:
+            deadline, entry_num, p = heapq.heappop(self.deadlines)
+            if p in self.participants:
+                candidates[p] = entry_num
+        times = self.times_in_market(list(candidates))
+        perished = {p: entry_num for (p, entry_num), time in zip(candidates.items(), times) if time >= p.time_to_critical}
+        # remove them in the order in which they entered the market
+        for p in sorted(perished, key=perished.get):
             self.remove_participant(p)
 
     def update(self, added_pairs=list(), matched_pairs=list(), altruists=list(), update_time=False):
@@ -269,56 +536,36 @@ class Market:
         :return:
         """
         if update_time:
-            for p in self.participants:
-                p.time_in_market = p.time_in_market + PERIOD_LENGTH
-                if p.recipient:
-                    p.dialysis_days = p.dialysis_days + 30 * PERIOD_LENGTH
+            self.clock += PERIOD_LENGTH
+            for table in self.tables:
+                table.advance_time(PERIOD_LENGTH)
         if PERISH & update_time:
             self.remove_perished()
-        for pair in added_pairs:
-            self.add_pair(pair)
+        self.add_pairs(added_pairs)
+        if update_time:
+            waiting = [pair[0] for pair in matched_pairs if pair[0].recipient and (pair[0].blood_type!="X")]
+            for wait_time in self.times_in_market(waiting):
+                self.wait_times.add(wait_time)
+                self.total_wait_time = self.total_wait_time + wait_time
         for pair in matched_pairs:
-            if pair[0].recipient and (pair[0].blood_type!="X") and update_time:
-                self.wait_times.append(pair[0].time_in_market)
-                self.total_wait_time = self.total_wait_time + pair[0].time_in_market
             self.remove_participant(pair[0])
             self.remove_participant(pair[1])
             if pair in altruists:
                 self.altruists.remove(pair)
-        for a in altruists:
-            self.add_pair(a)
-            self.altruists.append(a)
+        self.add_pairs(altruists)
+        self.altruists.extend(altruists)
 
     def get_adj_list(self):
         """
-        Creates an adjacency list of all the participants in the market
+        Gets the adjacency list of all the participants in the market
         Each patient-donor pair is represented with their unique id_num
-        :return: a dictionary where the id_nums are keys and the values are
-        the id_nums of the patients that the donor points to and a dictionary of
-        all the pair id and their pairs
-        """
-        # pairs are the keys
-        weights_list = {}
-        adj_list = {}
-        pair_dict = {}
-        vertex_list = list()
-        for participant in self.participants:
-            if participant.donor:
-                neigh_list = list()
-                for patient in participant.neighbours:
-                    neigh_list.append(patient.id_num)
-                    if WEIGHTS == 'KPD':
-                        weight = calculate_kpd_weight(participant, patient)
-                    else:
-                        weight = patient.weight
-                        if participant.altruist:
-                            weight += ALT_WEIGHT
-                    weights_list[(participant.id_num, patient.id_num)] = weight
-                adj_list[participant.id_num] = neigh_list
-                pair_dict[participant.id_num] = participant
-            if participant.id_num not in vertex_list:
-                vertex_list.append(participant.id_num)
-        return adj_list, pair_dict, weights_list, vertex_list
+        The adjacency list, pairs and weights are kept up to date as participants and edges are added and removed,
+        so they are returned as they are rather than copied, and must not be modified
+        :return: a dictionary where the id_nums of the donors are keys and the values are the id_nums of
+        the patients that the donor points to, a dictionary of all the pair id and their donors,
+        a dictionary of the edge weights keyed by (donor id_num, patient id_num) and a list of all the id_nums
+        """
+        return self.adj_list, self.pair_dict, self.edge_weights, list(self.vertex_counts)
 
     def get_alt_list(self):
         """
@@ -330,6 +577,15 @@ class Market:
         return alt_list
 
 
+def in_entry_order(buckets):
+    """
+    merges buckets of participants into one sequence
+    :param buckets: dicts mapping each participant to the order in which it entered the market
+    :return: an iterator over the participants of all the buckets, in the order in which they entered the market
+    """
+    return (p for order, p in heapq.merge(*[((order, p) for p, order in bucket.items()) for bucket in buckets]))
+
+
 def calculate_kpd_weight(donor, recipient):
         """
         calculates the weight of the edge connecting the donor to the recipient
@@ -1,6 +1,226 @@
 import xlsxwriter
 import os
-from config import RESULTS_PATH, CPRA, ALGORITHM, WEIGHTS, START_SIZE, NUM_PERIODS
+import bisect
+import math
+import numpy as np
+from participant_table import BLOOD_TYPE_CODES, cpra_bands
+from config import RESULTS_PATH, CPRA, ALGORITHM, WEIGHTS, START_SIZE, NUM_PERIODS, PERIOD_LENGTH
+
+
+class WaitTimeStats:
+    """
+    Streaming statistics of the wait times of matched recipients
+    Wait times are multiples of PERIOD_LENGTH, so they take few distinct values and are kept as a histogram:
+    adding a wait time is O(log k) and the order statistics are O(k), for k distinct wait times
+    Attributes
+    ----------
+    counts: dict<int, int>
+        the number of times each wait time has been added
+    values: list<int>
+        the distinct wait times, in increasing order
+    count: int
+        the number of wait times added
+    total: int
+        the sum of the wait times added
+    """
+
+    def __init__(self):
+        self.counts = dict()
+        self.values = list()
+        self.count = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, wait_time):
+        """
+        adds a wait time
+        :param wait_time: the time a matched recipient spent in the market
+        """
+        if wait_time not in self.counts:
+            bisect.insort(self.values, wait_time)
+            self.counts[wait_time] = 0
+        self.counts[wait_time] += 1
+        self.count += 1
+        self.total += wait_time
+
+    def mean(self):
+        """
+        :return: the mean wait time, or 0 if there are none
+        """
+        return self.total / self.count if self.count > 0 else 0
+
+    def value_at(self, index):
+        """
+        :param index: an index into the sorted wait times
+        :return: the wait time at that index
+        """
+        for value in self.values:
+            index -= self.counts[value]
+            if index < 0:
+                return value
+        raise IndexError("wait time index out of range")
+
+    def median(self):
+        """
+        :return: the median wait time (the mean of the two middle wait times if there is an even number,
+        as statistics.median), or 0 if there are none
+        """
+        if self.count == 0:
+            return 0
+        if self.count % 2 == 1:
+            return self.value_at(self.count // 2)
+        return (self.value_at(self.count // 2 - 1) + self.value_at(self.count // 2)) / 2
+
+    def quantile(self, q):
+        """
+        :param q: a probability between 0 and 1
+        :return: the lowest wait time which is at least a fraction q of the wait times (the nearest rank), or 0 if there are none
+        """
+        if self.count == 0:
+            return 0
+        return self.value_at(max(0, math.ceil(q * self.count) - 1))
+
+    def histogram(self):
+        """
+        :return: a list of the number of wait times of 0, 1, 2, ... periods (wait times are rounded down to whole periods)
+        """
+        if self.count == 0:
+            return list()
+        histogram = [0] * (self.values[-1] // PERIOD_LENGTH + 1)
+        for value in self.values:
+            histogram[value // PERIOD_LENGTH] += self.counts[value]
+        return histogram
+
+
+# the columns of a trial table which hold why a trial failed (AR), and the time it ran in seconds (AS)
+TRIAL_ERROR_COLUMN = 43
+TRIAL_RUN_TIME_COLUMN = 44
+# the (recipient, donor) blood types of the composition columns of the tables, in order
+COMPOSITION_COLUMNS = [(recipient, donor) for recipient in ('A', 'B', 'AB', 'O') for donor in ('O', 'A', 'B', 'AB')]
+
+
+def write_trial_table_header(workbook, trial_table):
+    """
+    writes the header row of a trial table
+    :param workbook: the xlsxwriter Workbook of the trial table
+    :param trial_table: the xlsxwriter Worksheet of the trial table
+    """
+    # Widen the first column to make the text clearer.
+    trial_table.set_column('A:AC', 20)
+
+    # Add a bold format to use to highlight cells.
+    bold = workbook.add_format({'bold': True})
+
+    # Write some simple text.
+    trial_table.write('A1', 'Seed Number', bold)
+    # Write some simple text.
+    trial_table.write('B1', 'Total Num Participants', bold)
+    trial_table.write('C1', 'Total Num Altruists', bold)
+    trial_table.write('D1', 'Participants in Period', bold)
+    trial_table.write('E1', 'Num Altruists in Market', bold)
+    trial_table.write('F1', 'Matches in Period', bold)
+    trial_table.write('G1', 'Num Altruists in Matching', bold)
+    trial_table.write('H1', 'Total Num Matches', bold)
+    trial_table.write('I1', 'Current # (A, O)', bold) # (recipient, donor)
+    trial_table.write('J1', 'Current # (A, A)', bold)
+    trial_table.write('K1', 'Current # (A, B)', bold)
+    trial_table.write('L1', 'Current # (A, AB)', bold)
+    trial_table.write('M1', 'Current # (B, O)', bold)
+    trial_table.write('N1', 'Current # (B, A)', bold)
+    trial_table.write('O1', 'Current # (B, B)', bold)
+    trial_table.write('P1', 'Current # (B, AB)', bold)
+    trial_table.write('Q1', 'Current # (AB, O)', bold)
+    trial_table.write('R1', 'Current # (AB, A)', bold)
+    trial_table.write('S1', 'Current # (AB, B)', bold)
+    trial_table.write('T1', 'Current # (AB, AB)', bold)
+    trial_table.write('U1', 'Current # (O, O)', bold)
+    trial_table.write('V1', 'Current # (O, A)', bold)
+    trial_table.write('W1', 'Current # (O, B)', bold)
+    trial_table.write('X1', 'Current # (O, AB)', bold)
+    trial_table.write('Y1', 'Current # CPRA: ' + str(CPRA[0]), bold)
+    trial_table.write('Z1', 'Current # CPRA: ' + str(CPRA[1]), bold)
+    trial_table.write('AA1', 'Current # CPRA: ' + str(CPRA[2]), bold)
+    trial_table.write('AB1', 'Current # CPRA: ' + str(CPRA[3]), bold)
+    trial_table.write('AC1', 'Current # CPRA: ' + str(CPRA[4]), bold)
+    trial_table.write('AD1', 'Total Wait Time (periods)', bold)
+    trial_table.write('AE1', 'Total Wait Time of Unmatched Pairs', bold)
+    trial_table.write('AF1', 'Median Wait Time', bold)
+    if ALGORITHM == 'LP' or ALGORITHM == 'FAST':
+        trial_table.write('AG1', '# 2 cycles', bold)
+        trial_table.write('AH1', '# 3 cycles', bold)
+        trial_table.write('AI1', '# 4 cycles', bold)
+        trial_table.write('AJ1', '# 5 cycles', bold)
+        trial_table.write('AK1', '# 6+ cycles', bold)
+        trial_table.write('AL1', '# path matches', bold)
+        trial_table.write('AM1', '# 0~5 paths', bold)
+        trial_table.write('AN1', '# 6~10 paths', bold)
+        trial_table.write('AO1', '# 11~15 paths', bold)
+        trial_table.write('AP1', '# 16~20 paths', bold)
+        trial_table.write('AQ1', '# 20+ paths', bold)
+    trial_table.write('AR1', 'Error', bold)
+    trial_table.write('AS1', 'Run Time (s)', bold)
+
+
+class TrialRecord:
+    """
+    The row of one seed trial in a trial table, kept as plain values so that a trial can run in a worker process
+    and the parent can write its row into the table
+    It can be passed as the trial_table of Simulations: the cells of its trial's row are recorded, and the header
+    cells and column widths are left to the parent, which writes them with write_trial_table_header
+    Attributes
+    ----------
+    seed: int
+        the seed of the trial
+    trial_num: int
+        the number of the trial, which is its row in the trial table
+    values: dict<int, object>
+        the value of each column of the trial's row that has been written
+    run_time: float
+        the time the trial ran in seconds (until it finished, failed or was stopped), or None if it has not run
+    error: str
+        a description of why the trial failed, or None if it succeeded
+    """
+
+    def __init__(self, seed, trial_num):
+        self.seed = seed
+        self.trial_num = trial_num
+        self.values = dict()
+        self.run_time = None
+        self.error = None
+
+    def write(self, row, col=None, value=None, cell_format=None):
+        """
+        records a cell of the trial's row (cells in A1 notation are header cells, which are ignored)
+        """
+        if isinstance(row, str):
+            return
+        if row != self.trial_num:
+            raise ValueError("trial " + str(self.trial_num) + " cannot write to row " + str(row))
+        self.values[col] = value
+
+    def set_column(self, *args, **kwargs):
+        """
+        ignored, as the column widths are set by the parent
+        """
+        pass
+
+    def write_row(self, trial_table):
+        """
+        writes the recorded row into a trial table, with the error and run time of the trial
+        (only the seed, error and run time are written if the trial failed)
+        :param trial_table: an xlsxwriter Worksheet
+        """
+        if self.error is None:
+            for col, value in self.values.items():
+                trial_table.write(self.trial_num, col, value)
+        else:
+            trial_table.write(self.trial_num, 0, self.seed)
+            trial_table.write(self.trial_num, TRIAL_ERROR_COLUMN, self.error)
+        if self.run_time is not None:
+            trial_table.write(self.trial_num, TRIAL_RUN_TIME_COLUMN, self.run_time)
+
 
 class Metrics:
     """
@@ -10,32 +230,12 @@ class Metrics:
     def __init__(self, num_altruists, per_period, weights=None, run_num=-1, max_cycle_size=3, max_path_size=3):
         self.num_altruists = num_altruists
         self.per_period = per_period
-        self.donor_o_patient_o = 0
-        self.donor_a_patient_o = 0
-        self.donor_b_patient_o = 0
-        self.donor_ab_patient_o = 0
-        self.donor_o_patient_ab = 0
-        self.donor_a_patient_ab = 0
-        self.donor_b_patient_ab = 0
-        self.donor_ab_patient_ab = 0
-        self.donor_o_patient_a = 0
-        self.donor_a_patient_a = 0
-        self.donor_b_patient_a = 0
-        self.donor_ab_patient_a = 0
-        self.donor_o_patient_b = 0
-        self.donor_a_patient_b = 0
-        self.donor_b_patient_b = 0
-        self.donor_ab_patient_b = 0
-        self.cpra_1 = 0
-        self.cpra_2 = 0
-        self.cpra_3 = 0
-        self.cpra_4 = 0
-        self.cpra_5 = 0
-        self.w_cpra1 = [[0 for i in range(4)] for j in range(4)]
-        self.w_cpra2 = [[0 for i in range(4)] for j in range(4)]
-        self.w_cpra3 = [[0 for i in range(4)] for j in range(4)]
-        self.w_cpra4 = [[0 for i in range(4)] for j in range(4)]
-        self.w_cpra5 = [[0 for i in range(4)] for j in range(4)]
+        # the number of pairs in the market by (recipient blood type code, donor blood type code)
+        self.blood_type_composition = np.zeros((4, 4), dtype=int)
+        # the number of pairs in the market by cpra band
+        self.cpra_composition = np.zeros(len(CPRA), dtype=int)
+        # the number of pairs in the market by (cpra band, recipient blood type code, donor blood type code), for training weights
+        self.weight_composition = np.zeros((len(CPRA), 4, 4), dtype=int)
         self.total_num_perished = 0
         self.total_num_matched = 0
         self.total_num_participants = 0
@@ -48,257 +248,25 @@ class Metrics:
         self.initialize_table()
         self.weights = weights
 
-    def update_blood_type_composition(self, pair, remove):
+    def update_compositions(self, pairs, remove):
         """
-        Updates the ongoing count of the different type blood types currently in the market
+        Updates the ongoing counts of the blood types and cpra bands of the pairs currently in the market
         Also updates the composition for the weights for training
-        :param pair: a tuple of Participants, in the form (recipient, donor) a patient-donor pair that we are adding/removing
+        :param pairs: a list of tuples of Participants, in the form (recipient, donor), the patient-donor pairs that we are adding/removing
         :param remove: false if adding to the market, true if removing from the market
         """
         # don't log altruist blood types here
-        if pair[0].blood_type == 'X':
-            return
-        if remove:
-            var = -1
-        else:
-            var = 1
-        if pair[1].blood_type == 'O':
-            if pair[0].blood_type == 'O':
-                self.donor_o_patient_o += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[0][0] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[0][0] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[0][0] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[0][0] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[0][0] += var
-            if pair[0].blood_type == 'A':
-                self.donor_o_patient_a += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[1][0] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[1][0] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[1][0] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[1][0] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[1][0] += var
-            if pair[0].blood_type == 'AB':
-                self.donor_o_patient_ab += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[3][0] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[3][0] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[3][0] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[3][0] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[3][0] += var
-            if pair[0].blood_type == 'B':
-                self.donor_o_patient_b += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[2][0] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[2][0] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[2][0] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[2][0] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[2][0] += var
-        if pair[1].blood_type == 'A':
-            if pair[0].blood_type == 'O':
-                self.donor_a_patient_o += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[0][1] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[0][1] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[0][1] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[0][1] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[0][1] += var
-            if pair[0].blood_type == 'A':
-                self.donor_a_patient_a += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[1][1] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[1][1] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[1][1] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[1][1] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[1][1] += var
-            if pair[0].blood_type == 'AB':
-                self.donor_a_patient_ab += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[3][1] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[3][1] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[3][1] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[3][1] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[3][1] += var
-            if pair[0].blood_type == 'B':
-                self.donor_a_patient_b += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[2][1] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[2][1] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[2][1] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[2][1] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[2][1] += var
-        if pair[1].blood_type == 'AB':
-            if pair[0].blood_type == 'O':
-                self.donor_ab_patient_o += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[0][3] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[0][3] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[0][3] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[0][3] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[0][3] += var
-            if pair[0].blood_type == 'A':
-                self.donor_ab_patient_a += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[1][3] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[1][3] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[1][3] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[1][3] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[1][3] += var
-            if pair[0].blood_type == 'AB':
-                self.donor_ab_patient_ab += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[3][3] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[3][3] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[3][3] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[3][3] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[3][3] += var
-            if pair[0].blood_type == 'B':
-                self.donor_ab_patient_b += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[2][3] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[2][3] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[2][3] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[2][3] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[2][3] += var
-        if pair[1].blood_type == 'B':
-            if pair[0].blood_type == 'O':
-                self.donor_b_patient_o += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[0][2] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[0][2] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[0][2] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[0][2] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[0][2] += var
-            if pair[0].blood_type == 'A':
-                self.donor_b_patient_a += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[1][2] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[1][2] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[1][2] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[1][2] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[1][2] += var
-            if pair[0].blood_type == 'AB':
-                self.donor_b_patient_ab += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[3][2] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[3][2] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[3][2] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[3][2] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[3][2] += var
-            if pair[0].blood_type == 'B':
-                self.donor_b_patient_b += var
-                if self.weights is not None:
-                    if pair[1].cpra == CPRA[0][1]:
-                        self.w_cpra1[2][2] += var
-                    elif pair[1].cpra <= CPRA[1][1]:
-                        self.w_cpra2[2][2] += var
-                    elif pair[1].cpra <= CPRA[2][1]:
-                        self.w_cpra3[2][2] += var
-                    elif pair[1].cpra <= CPRA[3][1]:
-                        self.w_cpra4[2][2] += var
-                    elif pair[1].cpra <= CPRA[4][1]:
-                        self.w_cpra5[2][2] += var
-
-    def update_cpra_composition(self, pair, remove):
-        """
-        updates the ongoing count of the different cpra rates in the market
-        :param pair: a tuple of participants, in the form (recipient, donor) patient-donor pair that we are adding/removing
-        :param remove: false if adding to the market, true if removing from the market
-        """
-        if pair[0].blood_type == 'X':
+        pairs = [pair for pair in pairs if pair[0].blood_type != 'X']
+        if len(pairs) == 0:
             return
-        if remove:
-            var = -1
-        else:
-            var = 1
-        if pair[0].cpra == 0:
-            self.cpra_1 += var
-        elif pair[0].cpra <= CPRA[1][1]:
-            self.cpra_2 += var
-        elif pair[0].cpra <= CPRA[2][1]:
-            self.cpra_3 += var
-        elif pair[0].cpra <= CPRA[3][1]:
-            self.cpra_4 += var
-        else:
-            self.cpra_5 += var
-
-
+        var = -1 if remove else 1
+        recipient_types = np.array([BLOOD_TYPE_CODES[pair[0].blood_type] for pair in pairs])
+        donor_types = np.array([BLOOD_TYPE_CODES[pair[1].blood_type] for pair in pairs])
+        np.add.at(self.blood_type_composition, (recipient_types, donor_types), var)
+        np.add.at(self.cpra_composition, cpra_bands([pair[0].cpra for pair in pairs]), var)
+        if self.weights is not None:
+            bands = cpra_bands([pair[1].cpra for pair in pairs])
+            np.add.at(self.weight_composition, (bands, recipient_types, donor_types), var)
 
     def initialize_table(self):
         # Widen the first column to make the text clearer.
@@ -347,9 +315,16 @@ class Metrics:
             self.worksheet.write('AI1', '# 5 cycles', bold)
             self.worksheet.write('AJ1', '# 6+ cycles', bold)
             self.worksheet.write('AK1', '# path matches', bold)
+        self.worksheet.write('AL1', 'Mean Wait Time', bold)
+        self.worksheet.write('AM1', '90th Percentile Wait Time', bold)
+        self.worksheet.write('AN1', '# Matched Recipients by Periods Waited (0, 1, 2, ...)', bold)
 
 
     def update_table(self, num_matches, num_participants, num_added, num_altruists_in_market, num_altruists_in_matching, total_wait_time, median_wait_time, total_remaining_time, cycle_lengths= None, wait_times=None):
+        """
+        writes the row of a period to the table
+        :param wait_times: the WaitTimeStats of the market, whose mean, 90th percentile and histogram are written
+        """
         self.period_num = self.period_num + 1
         # Add a bold format to use to highlight cells.
         self.total_num_matched = self.total_num_matched + num_matches
@@ -366,27 +341,8 @@ class Metrics:
         self.worksheet.write(self.period_num, 4, num_matches)
         self.worksheet.write(self.period_num, 5, num_altruists_in_matching)
         self.worksheet.write(self.period_num, 6, self.total_num_matched)
-        self.worksheet.write(self.period_num, 7, self.donor_o_patient_a)
-        self.worksheet.write(self.period_num, 8, self.donor_a_patient_a)
-        self.worksheet.write(self.period_num, 9, self.donor_b_patient_a)
-        self.worksheet.write(self.period_num, 10, self.donor_ab_patient_a)
-        self.worksheet.write(self.period_num, 11, self.donor_o_patient_b)
-        self.worksheet.write(self.period_num, 12, self.donor_a_patient_b)
-        self.worksheet.write(self.period_num, 13, self.donor_b_patient_b)
-        self.worksheet.write(self.period_num, 14, self.donor_ab_patient_b)
-        self.worksheet.write(self.period_num, 15, self.donor_o_patient_ab)
-        self.worksheet.write(self.period_num, 16, self.donor_a_patient_ab)
-        self.worksheet.write(self.period_num, 17, self.donor_b_patient_ab)
-        self.worksheet.write(self.period_num, 18, self.donor_ab_patient_ab)
-        self.worksheet.write(self.period_num, 19, self.donor_o_patient_o)
-        self.worksheet.write(self.period_num, 20, self.donor_a_patient_o)
-        self.worksheet.write(self.period_num, 21, self.donor_b_patient_o)
-        self.worksheet.write(self.period_num, 22, self.donor_ab_patient_o)
-        self.worksheet.write(self.period_num, 23, self.cpra_1)
-        self.worksheet.write(self.period_num, 24, self.cpra_2)
-        self.worksheet.write(self.period_num, 25, self.cpra_3)
-        self.worksheet.write(self.period_num, 26, self.cpra_4)
-        self.worksheet.write(self.period_num, 27, self.cpra_5)
+        for i, column in enumerate(self.composition_columns()):
+            self.worksheet.write(self.period_num, 7 + i, column)
         self.worksheet.write(self.period_num, 28, total_wait_time)
         self.worksheet.write(self.period_num, 29, total_remaining_time)
         self.worksheet.write(self.period_num, 30, median_wait_time)
@@ -400,64 +356,15 @@ class Metrics:
         if self.weights is not None:
             self.update_proportions(num_participants/2 - num_altruists_in_market)
         if wait_times is not None:
-            for i in range(len(wait_times)):
-                self.worksheet.write(self.period_num, 40 + i, wait_times[i])
+            self.worksheet.write(self.period_num, 37, wait_times.mean())
+            self.worksheet.write(self.period_num, 38, wait_times.quantile(0.9))
+            for i, count in enumerate(wait_times.histogram()):
+                self.worksheet.write(self.period_num, 39 + i, count)
 
 
 
     def initialize_trial_table(self, trial_table = None):
-        # Widen the first column to make the text clearer.
-        trial_table.set_column('A:AC', 20)
-
-        # Add a bold format to use to highlight cells.
-        bold = self.workbook.add_format({'bold': True})
-
-        # Write some simple text.
-        trial_table.write('A1', 'Seed Number', bold)
-        # Write some simple text.
-        trial_table.write('B1', 'Total Num Participants', bold)
-        trial_table.write('C1', 'Total Num Altruists', bold)
-        trial_table.write('D1', 'Participants in Period', bold)
-        trial_table.write('E1', 'Num Altruists in Market', bold)
-        trial_table.write('F1', 'Matches in Period', bold)
-        trial_table.write('G1', 'Num Altruists in Matching', bold)
-        trial_table.write('H1', 'Total Num Matches', bold)
-        trial_table.write('I1', 'Current # (A, O)', bold) # (recipient, donor)
-        trial_table.write('J1', 'Current # (A, A)', bold)
-        trial_table.write('K1', 'Current # (A, B)', bold)
-        trial_table.write('L1', 'Current # (A, AB)', bold)
-        trial_table.write('M1', 'Current # (B, O)', bold)
-        trial_table.write('N1', 'Current # (B, A)', bold)
-        trial_table.write('O1', 'Current # (B, B)', bold)
-        trial_table.write('P1', 'Current # (B, AB)', bold)
-        trial_table.write('Q1', 'Current # (AB, O)', bold)
-        trial_table.write('R1', 'Current # (AB, A)', bold)
-        trial_table.write('S1', 'Current # (AB, B)', bold)
-        trial_table.write('T1', 'Current # (AB, AB)', bold)
-        trial_table.write('U1', 'Current # (O, O)', bold)
-        trial_table.write('V1', 'Current # (O, A)', bold)
-        trial_table.write('W1', 'Current # (O, B)', bold)
-        trial_table.write('X1', 'Current # (O, AB)', bold)
-        trial_table.write('Y1', 'Current # CPRA: ' + str(CPRA[0]), bold)
-        trial_table.write('Z1', 'Current # CPRA: ' + str(CPRA[1]), bold)
-        trial_table.write('AA1', 'Current # CPRA: ' + str(CPRA[2]), bold)
-        trial_table.write('AB1', 'Current # CPRA: ' + str(CPRA[3]), bold)
-        trial_table.write('AC1', 'Current # CPRA: ' + str(CPRA[4]), bold)
-        trial_table.write('AD1', 'Total Wait Time (periods)', bold)
-        trial_table.write('AE1', 'Total Wait Time of Unmatched Pairs', bold)
-        trial_table.write('AF1', 'Median Wait Time', bold)
-        if ALGORITHM == 'LP' or ALGORITHM == 'FAST':
-            trial_table.write('AG1', '# 2 cycles', bold)
-            trial_table.write('AH1', '# 3 cycles', bold)
-            trial_table.write('AI1', '# 4 cycles', bold)
-            trial_table.write('AJ1', '# 5 cycles', bold)
-            trial_table.write('AK1', '# 6+ cycles', bold)
-            trial_table.write('AL1', '# path matches', bold)
-            trial_table.write('AM1', '# 0~5 paths', bold)
-            trial_table.write('AN1', '# 6~10 paths', bold)
-            trial_table.write('AO1', '# 11~15 paths', bold)
-            trial_table.write('AP1', '# 16~20 paths', bold)
-            trial_table.write('AQ1', '# 20+ paths', bold)
+        write_trial_table_header(self.workbook, trial_table)
 
     def update_trial_table(self, num_matches, num_participants, num_added, num_altruists_in_market, num_altruists_in_matching,
                      total_wait_time, median_wait_time, total_remaining_time, seed_num, trial_num, cycle_lengths=None, wait_times=None, trial_table = None):
@@ -478,27 +385,8 @@ class Metrics:
             trial_table.write(trial_num, 5, num_matches)
             trial_table.write(trial_num, 6, num_altruists_in_matching)
             trial_table.write(trial_num, 7, self.total_num_matched)
-            trial_table.write(trial_num, 8, self.donor_o_patient_a)
-            trial_table.write(trial_num, 9, self.donor_a_patient_a)
-            trial_table.write(trial_num, 10, self.donor_b_patient_a)
-            trial_table.write(trial_num, 11, self.donor_ab_patient_a)
-            trial_table.write(trial_num, 12, self.donor_o_patient_b)
-            trial_table.write(trial_num, 13, self.donor_a_patient_b)
-            trial_table.write(trial_num, 14, self.donor_b_patient_b)
-            trial_table.write(trial_num, 15, self.donor_ab_patient_b)
-            trial_table.write(trial_num, 16, self.donor_o_patient_ab)
-            trial_table.write(trial_num, 17, self.donor_a_patient_ab)
-            trial_table.write(trial_num, 18, self.donor_b_patient_ab)
-            trial_table.write(trial_num, 19, self.donor_ab_patient_ab)
-            trial_table.write(trial_num, 20, self.donor_o_patient_o)
-            trial_table.write(trial_num, 21, self.donor_a_patient_o)
-            trial_table.write(trial_num, 22, self.donor_b_patient_o)
-            trial_table.write(trial_num, 23, self.donor_ab_patient_o)
-            trial_table.write(trial_num, 24, self.cpra_1)
-            trial_table.write(trial_num, 25, self.cpra_2)
-            trial_table.write(trial_num, 26, self.cpra_3)
-            trial_table.write(trial_num, 27, self.cpra_4)
-            trial_table.write(trial_num, 28, self.cpra_5)
+            for i, column in enumerate(self.composition_columns()):
+                trial_table.write(trial_num, 8 + i, column)
             trial_table.write(trial_num, 29, total_wait_time)
             trial_table.write(trial_num, 30, total_remaining_time)
             trial_table.write(trial_num, 31, median_wait_time)
@@ -510,12 +398,18 @@ class Metrics:
 
 
 
+    def composition_columns(self):
+        """
+        :return: the current number of pairs of each (recipient, donor) blood types in COMPOSITION_COLUMNS,
+        followed by the current number of pairs in each cpra band
+        """
+        return ([int(self.blood_type_composition[BLOOD_TYPE_CODES[recipient], BLOOD_TYPE_CODES[donor]])
+                 for recipient, donor in COMPOSITION_COLUMNS] + self.cpra_composition.tolist())
+
     def update_proportions(self, participants_in_market):
         if self.weights.first_flag:
-            self.weights.set_init_proportions(participants_in_market, self.w_cpra1, self.w_cpra2,
-                                            self.w_cpra3, self.w_cpra4, self.w_cpra5)
-        self.weights.update_proportions(participants_in_market, self.w_cpra1, self.w_cpra2,
-                                            self.w_cpra3, self.w_cpra4, self.w_cpra5)
+            self.weights.set_init_proportions(participants_in_market, self.weight_composition)
+        self.weights.update_proportions(participants_in_market, self.weight_composition)
 
     def close_table(self):
         self.workbook.close()
@@ -1,3 +1,7 @@
+import numpy as np
+from participant_table import TableColumn, BLOOD_TYPES, BLOOD_TYPE_CODES
+
+
 class Participant:
     """
         A participant in a kidney paired donation program
@@ -20,9 +24,11 @@ class Participant:
             True if the node is a recipient type
         altruist: boolean
             True if the node is a altruist
-        neighbours: list<Participant>
-            list of all the nodes that can be reached from this node
+        neighbours: dict<Participant, None>
+            all the nodes that can be reached from this node, in the order they were added (a dict is used as an ordered set)
             if this is a recipient in a patient-donor pair, the only node that can be reached will be the donor
+        in_neighbours: dict<Participant, None>
+            all the nodes from which this node can be reached, so that edges into it can be removed without a scan
         time_to_critical: int
             the time the participant can stay in the market
         time_in_market: int
@@ -38,38 +44,82 @@ class Participant:
             the age of the participant
         dialysis_days: int
             the number of days that the participant has been on dialysis
+        table: ParticipantTable
+            the table which stores the participant's time_in_market and dialysis_days (and a copy of its blood_type
+            and donor flag)
+        row: int
+            the participant's row of the table
         """
-    def __init__(self, id_num, blood_type, donor, recipient, altruist, time_to_critical, weight, cpra=0, province='QB', age=30, dialysis_days = 30):
+    __slots__ = ('id_num', 'blood_type', 'partner', 'donor', 'recipient', 'altruist', 'neighbours', 'in_neighbours',
+                 'time_to_critical', 'cpra', 'weight', 'province', 'age', 'table', 'row')
+
+    time_in_market = TableColumn(current='current_time_in_market')
+    dialysis_days = TableColumn(current='current_dialysis_days')
+
+    def __init__(self, id_num, blood_type, donor, recipient, altruist, time_to_critical, weight, cpra=0, province='QB', age=30, dialysis_days = 30, *, table):
         self.id_num = id_num
         self.blood_type = blood_type
         self.partner = None
         self.donor = donor
         self.recipient = recipient
         self.altruist = altruist
-        self.neighbours = list()
-        self.time_in_market = 0
+        self.neighbours = dict()
+        self.in_neighbours = dict()
         self.time_to_critical = time_to_critical
-        self.weight = weight
         self.cpra = cpra
+        self.weight = weight
         self.province = province
         self.age = age
-        self.dialysis_days = dialysis_days
+        self.table = table
+        self.row = int(table.add_rows(1, blood_type=BLOOD_TYPE_CODES[blood_type], donor=donor,
+                                      dialysis_days=dialysis_days)[0])
+
+    @classmethod
+    def create_many(cls, table, donor, recipient, blood_type, dialysis_days, **attributes):
+        """
+        creates participants with their attributes given as arrays, adding all their rows to the table at once
+        :param table: the ParticipantTable to store the participants in
+        :param donor: True if the participants are donors
+        :param recipient: True if the participants are recipients
+        :param blood_type: an array of the codes of the blood types of the participants (see BLOOD_TYPE_CODES)
+        :param dialysis_days: an array of the days on dialysis of the participants
+        :param attributes: the id_num, altruist, time_to_critical, cpra, weight, province and age of the participants,
+        as arrays of the same length or scalars
+        :return: a list of the new Participants
+        """
+        rows = table.add_rows(len(blood_type), blood_type=blood_type, donor=donor, dialysis_days=dialysis_days)
+        attributes = {name: np.broadcast_to(value, rows.shape).tolist() for name, value in attributes.items()}
+        participants = list()
+        for i, (row, code) in enumerate(zip(rows.tolist(), blood_type.tolist())):
+            participant = cls.__new__(cls)
+            participant.blood_type = BLOOD_TYPES[code]
+            participant.partner = None
+            participant.donor = donor
+            participant.recipient = recipient
+            participant.neighbours = dict()
+            participant.in_neighbours = dict()
+            participant.table = table
+            participant.row = row
+            for name, values in attributes.items():
+                setattr(participant, name, values[i])
+            participants.append(participant)
+        return participants
 
     def add_neighbour(self, neighbour):
         """
         Adds a neighbour to the participant
         :param neighbour: a Participant
         """
-        if not (neighbour in self.neighbours):
-            self.neighbours.append(neighbour)
+        self.neighbours[neighbour] = None
+        neighbour.in_neighbours[self] = None
 
     def remove_neighbour(self, neighbour):
         """
         Removes a neighbour from self.neighbour
         :param neighbour: a participant
         """
-        if neighbour in self.neighbours:
-            self.neighbours.remove(neighbour)
+        self.neighbours.pop(neighbour, None)
+        neighbour.in_neighbours.pop(self, None)
 
     def compatible(self, participant,random_state):
         """
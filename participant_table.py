@@ -0,0 +1,160 @@
+import numpy as np
+from config import CPRA
+
+# the blood types, indexed by their codes in a ParticipantTable ('X' is the blood type of the "fake participants" of altruists)
+BLOOD_TYPES = ('O', 'A', 'B', 'AB', 'X')
+# codes of the blood types
+BLOOD_TYPE_CODES = {blood_type: code for code, blood_type in enumerate(BLOOD_TYPES)}
+# the upper bounds of the cpra bands after the first (see CPRA), used by cpra_bands
+CPRA_UPPER_BOUNDS = np.array([upper for lower, upper in CPRA[1:]])
+# the columns of a ParticipantTable and their types
+COLUMNS = (('blood_type', np.int8), ('donor', bool), ('time_in_market', np.int64), ('dialysis_days', np.float64),
+           ('in_market', bool), ('entered', np.int64))
+# the days on dialysis that a recipient accumulates per unit of time in a market
+DIALYSIS_DAYS_PER_TIME = 30
+
+
+class ParticipantTable:
+    """
+    A columnar store of the attributes of participants which change with time in a market, with one row per Participant
+    Participants read and write their time in market and days on dialysis from their row, so that advancing time and
+    summing over the participants of a market are array operations
+    Attributes
+    ----------
+    size: int
+        the number of rows in use
+    clock: int
+        the total time that has passed in the market of the table's participants
+    blood_type, donor: numpy array
+        copies of the blood types (as codes, see BLOOD_TYPE_CODES) and donor flags of the participants, one entry per
+        row, for the sums over the participants of a market
+        the arrays of the table are reallocated as the table grows, so they should not be kept across calls to add_rows
+    time_in_market, dialysis_days: numpy array
+        the time in market and days on dialysis of each participant when it last entered or left a market
+        the current values of participants in a market are derived from the clock (see current_time_in_market
+        and current_dialysis_days), so that advancing time does not touch every row
+    in_market: numpy array
+        True for the rows of the participants that are in a market (the participants of a table should only be in
+        one market at a time)
+    entered: numpy array
+        the clock when each participant last entered a market
+    The table does not hold references to its participants, so a participant is freed once nothing else refers to it
+    """
+
+    def __init__(self, capacity=64):
+        """
+        :param capacity: the number of rows to allocate initially
+        """
+        self.size = 0
+        self.clock = 0
+        for name, dtype in COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def add_rows(self, num_rows, **columns):
+        """
+        adds rows to the table
+        :param num_rows: the number of rows to add
+        :param columns: the values of the columns for the new rows, as arrays or scalars (columns which are not given are 0)
+        :return: the indices of the new rows
+        """
+        capacity = len(self.in_market)
+        if self.size + num_rows > capacity:
+            capacity = max(2 * capacity, self.size + num_rows)
+            for name, dtype in COLUMNS:
+                column = np.zeros(capacity, dtype=dtype)
+                column[:self.size] = getattr(self, name)[:self.size]
+                setattr(self, name, column)
+        rows = np.arange(self.size, self.size + num_rows)
+        for name, value in columns.items():
+            getattr(self, name)[rows] = value
+        self.size += num_rows
+        return rows
+
+    def advance_time(self, time):
+        """
+        advances the clock, which adds time to the time_in_market of every participant in a market, and
+        DIALYSIS_DAYS_PER_TIME days per unit of time to the dialysis_days of every recipient in a market
+        :param time: the time that has passed
+        """
+        self.clock += time
+
+    def enter_market(self, row):
+        """
+        records that the participant of a row has entered a market
+        :param row: the row of the participant
+        """
+        self.in_market[row] = True
+        self.entered[row] = self.clock
+
+    def leave_market(self, row):
+        """
+        records that the participant of a row has left its market, keeping its current time in market and dialysis days
+        :param row: the row of the participant
+        """
+        if self.in_market[row]:
+            # a single row is updated with scalar arithmetic, which is cheaper than the array expressions
+            elapsed = self.clock - self.entered[row].item()
+            self.time_in_market[row] += elapsed
+            if not self.donor[row]:
+                self.dialysis_days[row] += DIALYSIS_DAYS_PER_TIME * elapsed
+            self.in_market[row] = False
+
+    def current_time_in_market(self, rows):
+        """
+        :param rows: a row or an array of rows
+        :return: the current time in market of the participants of the rows
+        """
+        return self.time_in_market[rows] + self.in_market[rows] * (self.clock - self.entered[rows])
+
+    def current_dialysis_days(self, rows):
+        """
+        :param rows: a row or an array of rows
+        :return: the current days on dialysis of the participants of the rows
+        """
+        recipient_in_market = self.in_market[rows] & ~self.donor[rows]
+        return self.dialysis_days[rows] + recipient_in_market * DIALYSIS_DAYS_PER_TIME * (self.clock - self.entered[rows])
+
+    def rows_in_market(self):
+        """
+        :return: the indices of the rows of the participants that are in a market
+        """
+        return np.flatnonzero(self.in_market[:self.size])
+
+
+def cpra_bands(cpra):
+    """
+    finds the cpra bands of cpras: band 0 is a cpra of exactly CPRA[0][1], and band i > 0 is a cpra above the
+    upper bound of band i - 1 and at most the upper bound of band i
+    :param cpra: a cpra or an array of cpras
+    :return: the index into CPRA of the band of each cpra
+    """
+    cpra = np.asarray(cpra, dtype=float)
+    return np.where(cpra == CPRA[0][1], 0, np.searchsorted(CPRA_UPPER_BOUNDS, cpra, side='left') + 1)
+
+
+class TableColumn:
+    """
+    An attribute of a Participant that is stored in a column of its ParticipantTable and derived from the clock
+    """
+
+    def __init__(self, current):
+        """
+        :param current: the name of the ParticipantTable method which derives the current value of the attribute
+        of a row from the column and the clock
+        """
+        self.current = current
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, participant, owner):
+        if participant is None:
+            return self
+        return getattr(participant.table, self.current)(participant.row).item()
+
+    def __set__(self, participant, value):
+        # store the value the column must hold for the current value to be the one given
+        column = getattr(participant.table, self.name)
+        column[participant.row] = value - (getattr(participant.table, self.current)(participant.row) -
+                                           column[participant.row])
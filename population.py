@@ -1,9 +1,53 @@
 from participant import Participant
+from participant_table import ParticipantTable, BLOOD_TYPE_CODES
 import os
-from config import PER_A, PER_B, PER_AB, PER_O, PER_CPRA, CPRA, TIME_TO_CRITICAL_LOW, ALT_WEIGHT, ARRIVAL_RATE, WEIGHTS, DATA_PATH, PER_BC, PER_AL, PER_SK, PER_MN, PER_ON, PER_QC, PER_NS, PER_NB, PER_PEI, PER_NFL
+from config import PER_A, PER_B, PER_AB, PER_O, PER_CPRA, CPRA, TIME_TO_CRITICAL_LOW, ALT_WEIGHT, ARRIVAL_RATE, WEIGHTS, DATA_PATH, BATCH_POPULATION, PER_BC, PER_AL, PER_SK, PER_MN, PER_ON, PER_QC, PER_NS, PER_NB, PER_PEI, PER_NFL
 from config import CPRA1, CPRA2, CPRA3, CPRA4, CPRA5
 import numpy as np
 
+# the bootstrap data loaded by load_bootstrap_data, keyed by data directory
+bootstrap_cache = dict()
+
+
+class BootstrapData:
+    """
+    The empirical samples that participant attributes are drawn from
+    ---------
+    dialysis_days: numpy array
+        days on dialysis of patients
+    donor_ages: numpy array
+        ages of donors
+    patient_ages: numpy array
+        ages of patients
+    """
+
+    def __init__(self, dialysis_days, donor_ages, patient_ages):
+        self.dialysis_days = dialysis_days
+        self.donor_ages = donor_ages
+        self.patient_ages = patient_ages
+
+
+def load_bootstrap_data(data_path=None):
+    """
+    loads the bootstrap data once per process and data directory
+    the arrays are memory-mapped read only, so that worker processes share the pages of the files
+    :param data_path: the directory of the .npy files, or None for DATA_PATH
+    :return: a BootstrapData
+    """
+    if data_path is None:
+        data_path = DATA_PATH
+    if data_path not in bootstrap_cache:
+        bootstrap_cache[data_path] = BootstrapData(
+            dialysis_days=np.load(os.path.join(data_path, "patient_days_bootstring.npy"), mmap_mode='r'),
+            donor_ages=np.load(os.path.join(data_path, "donor_ages_bootstring.npy"), mmap_mode='r'),
+            patient_ages=np.load(os.path.join(data_path, "patient_ages_bootstring.npy"), mmap_mode='r'))
+    return bootstrap_cache[data_path]
+
+
+# the weights of the OPT edge weights when no trained Weights are given,
+# indexed by (cpra band, recipient blood type code, donor blood type code)
+OPT_WEIGHTS = np.array([CPRA1, CPRA2, CPRA3, CPRA4, CPRA5])
+
 
 class Population:
     """
@@ -11,17 +55,30 @@ class Population:
     ---------
     count: int
         count that keeps track of how many pairs have entered the market and ensures that each pair is given a unique id
+    table: ParticipantTable
+        the table which stores the attributes of the participants that are generated
+    random_state: RandomState
+        the random stream that the attributes of the pairs are drawn from (the numpy.random module by default)
+    perish_random_state: RandomState
+        the random stream that the time_to_critical of the participants are drawn from (random_state by default)
     """
 
-    def __init__(self, weights=None):
+    def __init__(self, weights=None, data=None, random_state=None, perish_random_state=None):
+        """
+        :param weights: the trained Weights, or None
+        :param data: a preloaded BootstrapData, or None to use the process-wide one from load_bootstrap_data
+        :param random_state: a RandomState for the attributes of the pairs, or None for the global numpy.random
+        :param perish_random_state: a RandomState for the times to critical, or None to use random_state
+        """
         self.count = 0
-        dialysis_days_file_path = os.path.join(DATA_PATH, "patient_days_bootstring.npy")
-        donor_ages_file_path = os.path.join(DATA_PATH, "donor_ages_bootstring.npy")
-        patient_ages_file_path = os.path.join(DATA_PATH, "patient_ages_bootstring.npy")
-
-        self.dialysis_days = np.load(dialysis_days_file_path)
-        self.donor_ages = np.load(donor_ages_file_path)
-        self.patient_ages = np.load(patient_ages_file_path)
+        self.random_state = np.random if random_state is None else random_state
+        self.perish_random_state = self.random_state if perish_random_state is None else perish_random_state
+        self.table = ParticipantTable()
+        if data is None:
+            data = load_bootstrap_data()
+        self.dialysis_days = data.dialysis_days
+        self.donor_ages = data.donor_ages
+        self.patient_ages = data.patient_ages
 
         self.weights = weights
 
@@ -32,495 +89,155 @@ class Population:
                first_flag: boolean - a boolean indicating the first period
         :return: a list of tuples of participants in the form (recipient, donor)
         """
+        if BATCH_POPULATION:
+            return self.generate_pairs_batch(num_pairs, first_flag)
         new_pairs = list()
         i = 0
         while i < num_pairs:
-            index = np.random.choice(len(CPRA), p=PER_CPRA)
+            index = self.random_state.choice(len(CPRA), p=PER_CPRA)
             cpra_range = CPRA[index]
-            cpra = np.random.uniform(cpra_range[0], cpra_range[1])
-            donor_type = np.random.choice(['A', 'B', 'O', 'AB'], p=[PER_A, PER_B, PER_O, PER_AB])
-            recipient_type = np.random.choice(['A', 'B', 'O', 'AB'], p=[PER_A, PER_B, PER_O, PER_AB])
+            cpra = self.random_state.uniform(cpra_range[0], cpra_range[1])
+            donor_type = self.random_state.choice(['A', 'B', 'O', 'AB'], p=[PER_A, PER_B, PER_O, PER_AB])
+            recipient_type = self.random_state.choice(['A', 'B', 'O', 'AB'], p=[PER_A, PER_B, PER_O, PER_AB])
             weight = self.calculate_weight(donor_type, recipient_type, cpra, index)
 
-            dialysis_day = np.random.choice(self.dialysis_days)
-            donor_age = np.random.choice(self.donor_ages)
-            patient_age = np.random.choice(self.patient_ages)
+            dialysis_day = self.random_state.choice(self.dialysis_days)
+            donor_age = self.random_state.choice(self.donor_ages)
+            patient_age = self.random_state.choice(self.patient_ages)
 
             # generate a random time_to_critical value using a uniform distribution
             if first_flag:
                 upper = 70
                 lower = 10
-                time_to_critical = int(np.random.uniform(low = lower, high = upper, size = 1))
+                time_to_critical = int(self.perish_random_state.uniform(low = lower, high = upper))
             else:
                 #a = 1
-                time_to_critical = int(np.random.poisson(TIME_TO_CRITICAL_LOW, size = 1))
+                time_to_critical = int(self.perish_random_state.poisson(TIME_TO_CRITICAL_LOW))
 
-            province = np.random.choice(['BC', 'AL', 'SK', 'MN', 'ON', 'QC', 'NS', 'NB', 'PEI', 'NFL'], p=[PER_BC, PER_AL, PER_SK, PER_MN, PER_ON, PER_QC, PER_NS, PER_NB, PER_PEI, PER_NFL])
+            province = self.random_state.choice(['BC', 'AL', 'SK', 'MN', 'ON', 'QC', 'NS', 'NB', 'PEI', 'NFL'], p=[PER_BC, PER_AL, PER_SK, PER_MN, PER_ON, PER_QC, PER_NS, PER_NB, PER_PEI, PER_NFL])
 
             # if they are blood type compatible, only create new participant pairs if they are tissue type incompatible
             if donor_type == 'O' or recipient_type == 'AB' or donor_type == recipient_type:
-                if np.random.choice([True, False], p=[cpra, 1-cpra]):
-                    donor = Participant(self.count, donor_type, donor=True, recipient=False, altruist = False, time_to_critical=time_to_critical, weight=weight, cpra=cpra, age=donor_age, dialysis_days=dialysis_day, province=province)
-                    recipient = Participant(self.count, recipient_type, donor=False, recipient=True, altruist = False, time_to_critical=time_to_critical, weight=weight, cpra=cpra, age=patient_age, dialysis_days=dialysis_day, province=province)
+                if self.random_state.choice([True, False], p=[cpra, 1-cpra]):
+                    donor = Participant(self.count, donor_type, donor=True, recipient=False, altruist = False, time_to_critical=time_to_critical, weight=weight, cpra=cpra, age=donor_age, dialysis_days=dialysis_day, province=province, table=self.table)
+                    recipient = Participant(self.count, recipient_type, donor=False, recipient=True, altruist = False, time_to_critical=time_to_critical, weight=weight, cpra=cpra, age=patient_age, dialysis_days=dialysis_day, province=province, table=self.table)
                     new_pairs.append((recipient, donor))
                     i += 1
                     self.count += 1
             else:
-                donor = Participant(self.count, donor_type, donor=True, recipient=False, altruist = False, time_to_critical=time_to_critical, weight=weight, cpra=cpra, age=donor_age, dialysis_days=dialysis_day, province=province)
-                recipient = Participant(self.count, recipient_type, donor=False, recipient=True, altruist = False, time_to_critical=time_to_critical, weight=weight, cpra=cpra, age=patient_age, dialysis_days=dialysis_day,province=province)
+                donor = Participant(self.count, donor_type, donor=True, recipient=False, altruist = False, time_to_critical=time_to_critical, weight=weight, cpra=cpra, age=donor_age, dialysis_days=dialysis_day, province=province, table=self.table)
+                recipient = Participant(self.count, recipient_type, donor=False, recipient=True, altruist = False, time_to_critical=time_to_critical, weight=weight, cpra=cpra, age=patient_age, dialysis_days=dialysis_day,province=province, table=self.table)
                 new_pairs.append((recipient, donor))
                 i += 1
                 self.count += 1
         return new_pairs
 
+    def generate_pairs_batch(self, num_pairs, first_flag):
+        """
+        generates new patient-donor pairs based on the distribution of the population, as generate_pairs does,
+        but drawing every attribute for a block of candidate pairs at once and rejecting the blood type compatible,
+        tissue type compatible candidates with one mask, until num_pairs pairs are accepted
+        :param num_pairs: int - the number of pairs to generate
+               first_flag: boolean - a boolean indicating the first period
+        :return: a list of tuples of participants in the form (recipient, donor)
+        """
+        if num_pairs == 0:
+            return list()
+        blood_types = ['A', 'B', 'O', 'AB']
+        blood_type_codes = np.array([BLOOD_TYPE_CODES[blood_type] for blood_type in blood_types])
+        provinces = ['BC', 'AL', 'SK', 'MN', 'ON', 'QC', 'NS', 'NB', 'PEI', 'NFL']
+        cpra_ranges = np.array(CPRA, dtype=float)
+        blocks = list()
+        num_accepted = 0
+        while num_accepted < num_pairs:
+            # about half of the candidates are accepted
+            size = 2 * (num_pairs - num_accepted) + 8
+            index = self.random_state.choice(len(CPRA), size=size, p=PER_CPRA)
+            cpra = self.random_state.uniform(cpra_ranges[index, 0], cpra_ranges[index, 1])
+            donor_type = self.random_state.choice(len(blood_types), size=size, p=[PER_A, PER_B, PER_O, PER_AB])
+            recipient_type = self.random_state.choice(len(blood_types), size=size, p=[PER_A, PER_B, PER_O, PER_AB])
+            dialysis_day = self.random_state.choice(self.dialysis_days, size=size)
+            donor_age = self.random_state.choice(self.donor_ages, size=size)
+            patient_age = self.random_state.choice(self.patient_ages, size=size)
+            if first_flag:
+                time_to_critical = self.perish_random_state.uniform(low=10, high=70, size=size).astype(int)
+            else:
+                time_to_critical = self.perish_random_state.poisson(TIME_TO_CRITICAL_LOW, size=size)
+            province = self.random_state.choice(len(provinces), size=size, p=[PER_BC, PER_AL, PER_SK, PER_MN, PER_ON, PER_QC, PER_NS, PER_NB, PER_PEI, PER_NFL])
+            # if they are blood type compatible, only keep the pairs which are tissue type incompatible
+            abo_compatible = (donor_type == blood_types.index('O')) | (recipient_type == blood_types.index('AB')) | (donor_type == recipient_type)
+            accepted = ~abo_compatible | (self.random_state.random_sample(size) < cpra)
+            accepted = np.flatnonzero(accepted)[:num_pairs - num_accepted]
+            blocks.append((index[accepted], cpra[accepted], donor_type[accepted], recipient_type[accepted],
+                           dialysis_day[accepted], donor_age[accepted], patient_age[accepted],
+                           time_to_critical[accepted], province[accepted]))
+            num_accepted += len(accepted)
+        index, cpra, donor_type, recipient_type, dialysis_day, donor_age, patient_age, time_to_critical, province = \
+            [np.concatenate(column) for column in zip(*blocks)]
+
+        weight = self.calculate_weights(blood_type_codes[donor_type], blood_type_codes[recipient_type], index)
+        id_num = self.count + np.arange(num_pairs)
+        self.count += num_pairs
+        columns = dict(id_num=id_num, altruist=False, cpra=cpra, time_to_critical=time_to_critical, weight=weight,
+                       dialysis_days=dialysis_day, province=np.array(provinces)[province])
+        donors = Participant.create_many(self.table, donor=True, recipient=False, blood_type=blood_type_codes[donor_type],
+                                         age=donor_age, **columns)
+        recipients = Participant.create_many(self.table, donor=False, recipient=True,
+                                             blood_type=blood_type_codes[recipient_type], age=patient_age, **columns)
+        return list(zip(recipients, donors))
+
     def gen_rand_population_size(self):
         """
         gets a random population size centered around the arrival rate
         :return: integer representing a population size
         """
         difference = int(float(ARRIVAL_RATE) / 3.0)
-        return np.random.choice([ARRIVAL_RATE - (difference * 2), ARRIVAL_RATE - difference, ARRIVAL_RATE, ARRIVAL_RATE + difference, ARRIVAL_RATE + (difference * 2)], p=[0.1, 0.2, 0.4, 0.2, 0.1])
+        return self.random_state.choice([ARRIVAL_RATE - (difference * 2), ARRIVAL_RATE - difference, ARRIVAL_RATE, ARRIVAL_RATE + difference, ARRIVAL_RATE + (difference * 2)], p=[0.1, 0.2, 0.4, 0.2, 0.1])
 
     def generate_altruist(self, random_state):
         """
         generates an altruistic donor
+        :param random_state: the RandomState to draw the altruist from (its time_to_critical is drawn from perish_random_state)
         :return: a tuple of Participants in the form ("fake recipient", altruisitc donor)
         """
         donor_age = random_state.choice(self.donor_ages)
         donor_type = random_state.choice(['A', 'B', 'O', 'AB'], p=[PER_A, PER_B, PER_O, PER_AB])
-        time_to_critical = int(random_state.poisson(lam = TIME_TO_CRITICAL_LOW, size = 1))
-        altruistic_donor = Participant(self.count, donor_type, donor=True, recipient=False, altruist = True, time_to_critical=time_to_critical, weight=ALT_WEIGHT, cpra=0, age=donor_age, dialysis_days=0)
-        recipient = Participant(self.count, blood_type='X', donor=False, recipient=True,  altruist = True, time_to_critical=time_to_critical, weight=ALT_WEIGHT, cpra=0, dialysis_days=0)
+        time_to_critical = int(self.perish_random_state.poisson(lam = TIME_TO_CRITICAL_LOW))
+        altruistic_donor = Participant(self.count, donor_type, donor=True, recipient=False, altruist = True, time_to_critical=time_to_critical, weight=ALT_WEIGHT, cpra=0, age=donor_age, dialysis_days=0, table=self.table)
+        recipient = Participant(self.count, blood_type='X', donor=False, recipient=True,  altruist = True, time_to_critical=time_to_critical, weight=ALT_WEIGHT, cpra=0, dialysis_days=0, table=self.table)
         self.count += 1
         return recipient, altruistic_donor
 
+    def weight_table(self):
+        """
+        gives the weight of a pair for every cpra band and blood types of patient and donor
+        :return: an array of weights indexed by (cpra band, recipient blood type code, donor blood type code)
+        """
+        if WEIGHTS == "OPT":
+            # weights obtained while training
+            if self.weights is not None:
+                return self.weights.w
+            # specify the weights you want here - usually use those found by training
+            return OPT_WEIGHTS
+        return np.full((len(CPRA), 4, 4), 2)
+
+    def calculate_weights(self, donor_types, recipient_types, bands):
+        """
+        determines the weights of pairs based on blood types of patients and donors and cpra bands
+        :param donor_types: an array of blood type codes of the donors
+        :param recipient_types: an array of blood type codes of the recipients
+        :param bands: an array of cpra bands (indices into CPRA)
+        :return: an array of weights
+        """
+        return self.weight_table()[bands, recipient_types, donor_types]
+
     def calculate_weight(self, donor_type, recipient_type, cpra, index):
         """
         determines the weight of a pair based on blood type of patient and donor and cpra
         :param donor_type: blood type of the donor
         :param recipient_type: blood type of the recipient
         :param cpra: the cpra
+        :param index: the cpra band of the cpra
         :return: a weight in the form of an int
         """
-        if WEIGHTS == "CONST":
-            return 2
-        elif WEIGHTS == "OPT":
-            # weights obtained while training
-            if self.weights is not None:
-                if cpra == CPRA[0][1]:
-                    if donor_type == 'O':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra1[0][0]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra1[1][0]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra1[2][0]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra1[3][0]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra1[4][0]
-                    if donor_type == 'A':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra1[0][1]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra1[1][1]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra1[2][1]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra1[3][1]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra1[4][1]
-                    if donor_type == 'B':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra1[0][2]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra1[1][2]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra1[2][2]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra1[3][2]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra1[4][2]
-                    if donor_type == 'AB':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra1[0][3]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra1[1][3]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra1[2][3]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra1[3][3]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra1[4][3]
-                elif cpra <= CPRA[1][1]:
-                    if donor_type == 'O':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra2[0][0]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra2[1][0]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra2[2][0]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra2[3][0]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra2[4][0]
-                    if donor_type == 'A':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra2[0][1]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra2[1][1]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra2[2][1]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra2[3][1]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra2[4][1]
-                    if donor_type == 'B':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra2[0][2]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra2[1][2]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra2[2][2]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra2[3][2]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra2[4][2]
-                    if donor_type == 'AB':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra2[0][3]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra2[1][3]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra2[2][3]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra2[3][3]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra2[4][3]
-                elif cpra <= CPRA[2][1]:
-                    if donor_type == 'O':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra3[0][0]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra3[1][0]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra3[2][0]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra3[3][0]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra3[4][0]
-                    if donor_type == 'A':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra3[0][1]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra3[1][1]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra3[2][1]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra3[3][1]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra3[4][1]
-                    if donor_type == 'B':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra3[0][2]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra3[1][2]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra3[2][2]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra3[3][2]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra3[4][2]
-                    if donor_type == 'AB':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra3[0][3]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra3[1][3]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra3[2][3]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra3[3][3]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra3[4][3]
-                elif cpra <= CPRA[3][1]:
-                    if donor_type == 'O':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra4[0][0]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra4[1][0]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra4[2][0]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra4[3][0]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra4[4][0]
-                    if donor_type == 'A':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra4[0][1]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra4[1][1]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra4[2][1]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra4[3][1]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra4[4][1]
-                    if donor_type == 'B':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra4[0][2]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra4[1][2]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra4[2][2]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra4[3][2]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra4[4][2]
-                    if donor_type == 'AB':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra4[0][3]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra4[1][3]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra4[2][3]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra4[3][3]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra4[4][3]
-                elif cpra <= CPRA[4][1]:
-                    if donor_type == 'O':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra5[0][0]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra5[1][0]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra5[2][0]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra5[3][0]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra5[4][0]
-                    if donor_type == 'A':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra5[0][1]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra5[1][1]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra5[2][1]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra5[3][1]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra5[4][1]
-                    if donor_type == 'B':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra5[0][2]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra5[1][2]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra5[2][2]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra5[3][2]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra5[4][2]
-                    if donor_type == 'AB':
-                        if recipient_type == 'O':
-                            return self.weights.w_cpra5[0][3]
-                        elif recipient_type == 'A':
-                            return self.weights.w_cpra5[1][3]
-                        elif recipient_type == 'B':
-                            return self.weights.w_cpra5[2][3]
-                        elif recipient_type == 'AB':
-                            return self.weights.w_cpra5[3][3]
-                        elif recipient_type == 'X':
-                            return self.weights.w_cpra5[4][3]
-            else:
-                # specify the weights you want here - usually use those found by training
-                # initialize 5 cpra matrices
-                # select the weights according to the input, search by cpra first
-                if index == 0:
-                    if recipient_type == "O":
-                        if donor_type == "O":
-                            return CPRA1[0][0]
-                        elif donor_type == "A":
-                            return CPRA1[0][1]
-                        elif donor_type == "B":
-                            return CPRA1[0][2]
-                        elif donor_type == "AB":
-                            return CPRA1[0][3]
-                    if recipient_type == "A":
-                        if donor_type == "O":
-                            return CPRA1[1][0]
-                        elif donor_type == "A":
-                            return CPRA1[1][1]
-                        elif donor_type == "B":
-                            return CPRA1[1][2]
-                        elif donor_type == "AB":
-                            return CPRA1[1][3]
-                    if recipient_type == "B":
-                        if donor_type == "O":
-                            return CPRA1[2][0]
-                        elif donor_type == "A":
-                            return CPRA1[2][1]
-                        elif donor_type == "B":
-                            return CPRA1[2][2]
-                        elif donor_type == "AB":
-                            return CPRA1[2][3]
-                    if recipient_type == "AB":
-                        if donor_type == "O":
-                            return CPRA1[3][0]
-                        elif donor_type == "A":
-                            return CPRA1[3][1]
-                        elif donor_type == "B":
-                            return CPRA1[3][2]
-                        elif donor_type == "AB":
-                            return CPRA1[3][3]
-                elif index == 1:
-                    if recipient_type == "O":
-                        if donor_type == "O":
-                            return CPRA2[0][0]
-                        elif donor_type == "A":
-                            return CPRA2[0][1]
-                        elif donor_type == "B":
-                            return CPRA2[0][2]
-                        elif donor_type == "AB":
-                            return CPRA2[0][3]
-                    if recipient_type == "A":
-                        if donor_type == "O":
-                            return CPRA2[1][0]
-                        elif donor_type == "A":
-                            return CPRA2[1][1]
-                        elif donor_type == "B":
-                            return CPRA2[1][2]
-                        elif donor_type == "AB":
-                            return CPRA2[1][3]
-                    if recipient_type == "B":
-                        if donor_type == "O":
-                            return CPRA2[2][0]
-                        elif donor_type == "A":
-                            return CPRA2[2][1]
-                        elif donor_type == "B":
-                            return CPRA2[2][2]
-                        elif donor_type == "AB":
-                            return CPRA2[2][3]
-                    if recipient_type == "AB":
-                        if donor_type == "O":
-                            return CPRA2[3][0]
-                        elif donor_type == "A":
-                            return CPRA2[3][1]
-                        elif donor_type == "B":
-                            return CPRA2[3][2]
-                        elif donor_type == "AB":
-                            return CPRA2[3][3]
-                elif index == 2:
-                    if recipient_type == "O":
-                        if donor_type == "O":
-                            return CPRA3[0][0]
-                        elif donor_type == "A":
-                            return CPRA3[0][1]
-                        elif donor_type == "B":
-                            return CPRA3[0][2]
-                        elif donor_type == "AB":
-                            return CPRA3[0][3]
-                    if recipient_type == "A":
-                        if donor_type == "O":
-                            return CPRA3[1][0]
-                        elif donor_type == "A":
-                            return CPRA3[1][1]
-                        elif donor_type == "B":
-                            return CPRA3[1][2]
-                        elif donor_type == "AB":
-                            return CPRA3[1][3]
-                    if recipient_type == "B":
-                        if donor_type == "O":
-                            return CPRA3[2][0]
-                        elif donor_type == "A":
-                            return CPRA3[2][1]
-                        elif donor_type == "B":
-                            return CPRA3[2][2]
-                        elif donor_type == "AB":
-                            return CPRA3[2][3]
-                    if recipient_type == "AB":
-                        if donor_type == "O":
-                            return CPRA3[3][0]
-                        elif donor_type == "A":
-                            return CPRA3[3][1]
-                        elif donor_type == "B":
-                            return CPRA3[3][2]
-                        elif donor_type == "AB":
-                            return CPRA3[3][3]
-                elif index == 3:
-                    if recipient_type == "O":
-                        if donor_type == "O":
-                            return CPRA4[0][0]
-                        elif donor_type == "A":
-                            return CPRA4[0][1]
-                        elif donor_type == "B":
-                            return CPRA4[0][2]
-                        elif donor_type == "AB":
-                            return CPRA4[0][3]
-                    if recipient_type == "A":
-                        if donor_type == "O":
-                            return CPRA4[1][0]
-                        elif donor_type == "A":
-                            return CPRA4[1][1]
-                        elif donor_type == "B":
-                            return CPRA4[1][2]
-                        elif donor_type == "AB":
-                            return CPRA4[1][3]
-                    if recipient_type == "B":
-                        if donor_type == "O":
-                            return CPRA4[2][0]
-                        elif donor_type == "A":
-                            return CPRA4[2][1]
-                        elif donor_type == "B":
-                            return CPRA4[2][2]
-                        elif donor_type == "AB":
-                            return CPRA4[2][3]
-                    if recipient_type == "AB":
-                        if donor_type == "O":
-                            return CPRA4[3][0]
-                        elif donor_type == "A":
-                            return CPRA4[3][1]
-                        elif donor_type == "B":
-                            return CPRA4[3][2]
-                        elif donor_type == "AB":
-                            return CPRA4[3][3]
-                elif index == 4:
-                    if recipient_type == "O":
-                        if donor_type == "O":
-                            return CPRA5[0][0]
-                        elif donor_type == "A":
-                            return CPRA5[0][1]
-                        elif donor_type == "B":
-                            return CPRA5[0][2]
-                        elif donor_type == "AB":
-                            return CPRA5[0][3]
-                    if recipient_type == "A":
-                        if donor_type == "O":
-                            return CPRA5[1][0]
-                        elif donor_type == "A":
-                            return CPRA5[1][1]
-                        elif donor_type == "B":
-                            return CPRA5[1][2]
-                        elif donor_type == "AB":
-                            return CPRA5[1][3]
-                    if recipient_type == "B":
-                        if donor_type == "O":
-                            return CPRA5[2][0]
-                        elif donor_type == "A":
-                            return CPRA5[2][1]
-                        elif donor_type == "B":
-                            return CPRA5[2][2]
-                        elif donor_type == "AB":
-                            return CPRA5[2][3]
-                    if recipient_type == "AB":
-                        if donor_type == "O":
-                            return CPRA5[3][0]
-                        elif donor_type == "A":
-                            return CPRA5[3][1]
-                        elif donor_type == "B":
-                            return CPRA5[3][2]
-                        elif donor_type == "AB":
-                            return CPRA5[3][3]
-                return 2
-        return 2
-
+        return self.weight_table()[index, BLOOD_TYPE_CODES[recipient_type], BLOOD_TYPE_CODES[donor_type]].item()
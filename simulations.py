@@ -1,8 +1,27 @@
+import logging
 import numpy as np
 from market import Market
 from population import Population
 from config import START_SIZE, NUM_PERIODS, ARRIVAL_RATE, CYCLE_CAP, CHAIN_CAP, RANDOM_SAMPLE
 
+logger = logging.getLogger(__name__)
+
+# the random streams of a trial, each spawned from the trial's root seed
+RANDOM_STREAMS = ('arrivals', 'compatibility', 'altruists', 'perishing')
+
+
+def spawn_random_states(seed=None):
+    """
+    spawns an independent random stream for each component of a trial, so that a trial gives the same results
+    for the same root seed whichever process runs it, and drawing more numbers in one component does not change
+    the numbers drawn in the others
+    :param seed: the root seed of the trial (an int or a SeedSequence), or None for fresh entropy
+    :return: a dict from each name in RANDOM_STREAMS to a RandomState
+    """
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    children = root.spawn(len(RANDOM_STREAMS))
+    return {name: np.random.RandomState(np.random.MT19937(child)) for name, child in zip(RANDOM_STREAMS, children)}
+
 
 class Simulations:
     """
@@ -23,16 +42,28 @@ class Simulations:
         None if this is not a trial test using different seeds
     trial_table:
         xslx Worksheet object for seed trial test
+    data:
+        a preloaded BootstrapData passed to the population, or None to use the process-wide one
+    seed: int
+        the root seed of the trial, from which the random streams are spawned (None for fresh entropy)
+    random_states: dict<str, RandomState>
+        the random stream of each component of the trial, keyed by the names in RANDOM_STREAMS
+    random_state: RandomState
+        the random stream of the altruists (random_states['altruists'])
     """
-    def __init__(self, altruists, per_period, weights=None, run_num=-1, max_cycle_size=CYCLE_CAP, max_path_size=CHAIN_CAP, test_trial_num=None, trial_table=None, seed_num=None):
-        self.random_state = np.random.RandomState()
+    def __init__(self, altruists, per_period, weights=None, run_num=-1, max_cycle_size=CYCLE_CAP, max_path_size=CHAIN_CAP, test_trial_num=None, trial_table=None, seed_num=None, data=None):
         self.seed = seed_num
+        self.random_states = spawn_random_states(seed_num)
+        self.random_state = self.random_states['altruists']
         self.test_trial_num = test_trial_num
         self.trial_table = trial_table
-        self.population = Population(weights=weights)
+        self.population = Population(weights=weights, data=data, random_state=self.random_states['arrivals'],
+                                     perish_random_state=self.random_states['perishing'])
         self.altruists = altruists
         self.per_period = per_period
-        self.market = Market(self.population.generate_pairs(START_SIZE,first_flag=True), self.altruists, self.per_period, weights, run_num, max_cycle_size=max_cycle_size, max_path_size=max_path_size)
+        self.market = Market(self.population.generate_pairs(START_SIZE,first_flag=True), self.altruists, self.per_period, weights, run_num, max_cycle_size=max_cycle_size, max_path_size=max_path_size,
+                             random_state=self.random_states['compatibility'], altruist_random_state=self.random_state,
+                             perish_random_state=self.random_states['perishing'])
         self.cycle_chain_matches = [[0,0,0,0,0],[0],[0,0,0,0,0]]
 
     def run(self):
@@ -42,8 +73,8 @@ class Simulations:
         """
         total_altruists = 0
         for i in range(NUM_PERIODS):
-            print("Starting period " + str(i) + " - Trial number" + str(self.test_trial_num))
-            num_pairs = np.random.poisson(ARRIVAL_RATE, None)
+            logger.debug("starting period %d - trial number %s", i, self.test_trial_num)
+            num_pairs = self.random_states['arrivals'].poisson(ARRIVAL_RATE, None)
             new_pairs = self.population.generate_pairs(num_pairs, first_flag=False)
             altruists = list()
             if RANDOM_SAMPLE:
@@ -51,11 +82,9 @@ class Simulations:
             else:
                 num_altruists = self.altruists
             total_altruists += num_altruists
-            x = np.random.randint(0,100,size=1)
             if i % self.per_period == 0:
                 for j in range(num_altruists):
                     altruists.append(self.population.generate_altruist(self.random_state))
-            y = np.random.randint(0, 100, size=1)
             cycle_path_lengths = self.market.run_period(new_participants=new_pairs,
                                    new_altruists=altruists, period_num=i, seed = self.seed, test_trial_num = self.test_trial_num, trial_table = self.trial_table)
             for i in range(0,5):
@@ -1,7 +1,11 @@
+import logging
+import multiprocessing
+import multiprocessing.connection
 import time
+import traceback
 import simulations as s
-from config import RESULTS_PATH, CYCLE_CAP, CHAIN_CAP, NUM_ALTRUISTS, WEIGHTS
-import numpy as np
+import market_metrics as met
+from config import RESULTS_PATH, CYCLE_CAP, CHAIN_CAP, NUM_ALTRUISTS, WEIGHTS, LOG_LEVEL, TRIAL_PROCESSES, TRIAL_TIMEOUT
 import xlsxwriter
 import os
 
@@ -9,32 +13,116 @@ import os
 Has all the functionalities for running tests on the affects of altruists in the market
 """
 
+logger = logging.getLogger(__name__)
 
-def test_altruists(seed=None, test_trial_num=None, trial_table=None):
-    np.random.seed(seed)
+
+def test_altruists(seed=None, test_trial_num=None, trial_table=None, run_num=-1):
+    '''
+    runs the simulations of a trial and logs a summary of its matches
+    :param run_num: the run number in the file name of the per period table, or -1 for no run number
+    '''
     cycle_matches = 0
     chain_matches = 0
     tic = time.perf_counter()
     for i in [NUM_ALTRUISTS]:
         for j in [1]:
-            print("Starting Simulations with " + str(i) + " altruists every " + str(j) + " periods")
+            logger.info("Starting Simulations with %d altruists every %d periods", i, j)
             sim = s.Simulations(altruists=i, per_period=j, test_trial_num=test_trial_num, trial_table=trial_table,
-                                seed_num=seed)
+                                seed_num=seed, run_num=run_num)
             sim.run()
             for i in range(0,4):
                 cycle_matches += sim.cycle_chain_matches[0][i]*(i+2)
             chain_matches += sim.cycle_chain_matches[1][0]
     toc = time.perf_counter()
-    print("The simulation finishes with %s second" % str(toc - tic))
-    print("There are " + str(cycle_matches) + " cycle matches and " + str(chain_matches) + " chain matches")
-    print("Chain match proportion is {}".format(chain_matches / (cycle_matches + chain_matches)))
-    print("---------------------------------------------------------")
+    logger.info("The simulation finishes with %s second", toc - tic)
+    logger.info("There are %d cycle matches and %d chain matches", cycle_matches, chain_matches)
+    logger.info("Chain match proportion is %s", chain_matches / (cycle_matches + chain_matches))
+
+
+def run_trial(seed, test_trial_num, connection):
+    '''
+    runs the trial of a seed in a worker process, and sends its TrialRecord to the parent
+    the trial's per period table is written to its own file (run number test_trial_num), as trials may run at the same time
+    :param connection: the sending end of a pipe to the parent
+    '''
+    record = met.TrialRecord(seed, test_trial_num)
+    tic = time.perf_counter()
+    try:
+        test_altruists(seed, test_trial_num, record, run_num=test_trial_num)
+    except Exception:
+        record.values = dict()
+        record.error = traceback.format_exc()
+    record.run_time = time.perf_counter() - tic
+    connection.send(record)
+    connection.close()
+
+
+def run_trials(seeds, processes=TRIAL_PROCESSES, timeout=TRIAL_TIMEOUT):
+    '''
+    runs the trials of several seeds in worker processes, with a new process for each trial
+    a trial which raises an exception, crashes its process or runs out of time is recorded as failed, and the other
+    trials go on
+    :param seeds: the seeds of the trials (trial i + 1 has seed seeds[i])
+    :param processes: the number of trials to run at the same time (at least 1)
+    :param timeout: the time limit of each trial in seconds, or None for no limit
+    :return: a list of TrialRecords, in the order of seeds
+    '''
+    if processes < 1:
+        raise ValueError("trials need at least one worker process, not " + str(processes))
+    records = [None] * len(seeds)
+    pending = list(enumerate(seeds))
+    pending.reverse()
+    # the trials that are running, keyed by the receiving end of their pipe
+    running = dict()
+    while pending or running:
+        while pending and len(running) < processes:
+            index, seed = pending.pop()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_trial, args=(seed, index + 1, sender))
+            process.start()
+            sender.close()
+            start = time.monotonic()
+            deadline = None if timeout is None else start + timeout
+            running[receiver] = (index, seed, process, start, deadline)
+
+        deadlines = [deadline for index, seed, process, start, deadline in running.values() if deadline is not None]
+        wait_time = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+        ready = multiprocessing.connection.wait(list(running), timeout=wait_time)
+        for receiver in list(running):
+            index, seed, process, start, deadline = running[receiver]
+            if receiver in ready:
+                try:
+                    record = receiver.recv()
+                except EOFError:
+                    # the process ended without sending its record
+                    process.join()
+                    record = met.TrialRecord(seed, index + 1)
+                    record.error = "worker process exited with code " + str(process.exitcode)
+                    record.run_time = time.monotonic() - start
+            elif deadline is not None and time.monotonic() >= deadline:
+                process.kill()
+                record = met.TrialRecord(seed, index + 1)
+                record.error = "timed out after " + str(timeout) + " seconds"
+                record.run_time = time.monotonic() - start
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[receiver]
+            if record.error is not None:
+                logger.error("trial %d (seed %s) failed: %s", index + 1, seed, record.error)
+            records[index] = record
+    return records
 
 
 # TEST_SEED = True
-def test_altruists_with_seeds():
+def test_altruists_with_seeds(processes=TRIAL_PROCESSES, timeout=TRIAL_TIMEOUT):
     '''
     run test_altruists multiple times with different seeds
+    the summary of the trials goes to one SeedTest workbook in RESULTS_PATH, and each trial also writes its per period
+    table to a workbook of its own, whose name starts with "RN" and its trial number (so a run writes one per seed)
+    :param processes: the number of worker processes to run the trials in (1 to run them one at a time)
+    :param timeout: the time limit of each trial in seconds, or None for no limit
     :return:
     '''
     seeds = [581,  81, 273,  86,  64, 754, 662,   7, 916, 128, 870, 315, 394,
@@ -46,13 +134,13 @@ def test_altruists_with_seeds():
     workbook = xlsxwriter.Workbook(results_file_path)
     trial_table = workbook.add_worksheet()
 
-    test_trial_num = 1
-    for seed in seeds:
-        test_altruists(seed, test_trial_num, trial_table)
-        test_trial_num += 1
+    met.write_trial_table_header(workbook, trial_table)
+    for record in run_trials(seeds, processes, timeout):
+        record.write_row(trial_table)
     workbook.close()
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=LOG_LEVEL)
     #test_altruists(207)
     test_altruists_with_seeds()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the simulator's modules are imported from the repository root (e.g. import config)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,64 @@
+"""Checks that the HiGHS backend (kidney_highs) finds matchings as good as Gurobi's"""
+
+import pytest
+
+import algorithms.kidney_solver.kidney_digraph as kidney_digraph
+import algorithms.kidney_solver.kidney_highs as kidney_highs
+import algorithms.kidney_solver.kidney_ip as kidney_ip
+import algorithms.kidney_solver.kidney_ndds as kidney_ndds
+import algorithms.kidney_solver.kidney_utils as kidney_utils
+
+# a fixed instance: the id nums of the pairs, the (source, target, score) pair-to-pair edges,
+# and the (altruist index, target, score) altruist edges
+VERTICES = [11, 12, 13, 14, 15, 16, 17, 18, 19]
+EDGES = ([11, 12, 12, 13, 14, 14, 15, 16, 17, 16, 18, 19, 13, 17],
+         [12, 11, 13, 14, 12, 15, 16, 17, 15, 18, 16, 11, 19, 13],
+         [2.5, 1.0, 3.0, 1.5, 2.0, 4.0, 1.0, 2.0, 3.5, 1.2, 2.2, 0.7, 1.8, 2.4])
+NDD_EDGES = ([0, 0, 1, 1], [11, 15, 17, 19], [1.1, 0.9, 2.6, 1.3])
+MAX_CYCLE = 3
+MAX_CHAIN = 3
+# the score of an optimal matching of the instance
+OPTIMAL_SCORE = 17.1
+
+
+def use_backend(monkeypatch, backend):
+    """makes kidney_ip build its models with a backend (gurobipy or kidney_highs)"""
+    for name in ("Model", "GRB", "quicksum", "Column"):
+        monkeypatch.setattr(kidney_ip, name, getattr(backend, name))
+
+
+def gurobi_backend():
+    """returns gurobipy, skipping the test if it is not installed or has no licence"""
+    gurobipy = pytest.importorskip("gurobipy")
+    try:
+        gurobipy.Model().optimize()
+    except gurobipy.GurobiError as e:
+        pytest.skip("no Gurobi licence: " + str(e))
+    return gurobipy
+
+
+def solve(formulation):
+    digraph = kidney_digraph.build_digraph(VERTICES, *EDGES, sparse=True)
+    ndds = kidney_ndds.build_ndds(2, *NDD_EDGES, digraph)
+    solution = formulation(kidney_ip.OptConfig(digraph, ndds, MAX_CYCLE, MAX_CHAIN))
+    kidney_utils.check_validity(solution, digraph, ndds, MAX_CYCLE, MAX_CHAIN)
+    return solution.total_score
+
+
+@pytest.mark.parametrize("formulation", [kidney_ip.optimise_picef, kidney_ip.optimise_picef_matrix])
+def test_highs_picef_is_optimal(monkeypatch, formulation):
+    use_backend(monkeypatch, kidney_highs)
+    assert solve(formulation) == pytest.approx(OPTIMAL_SCORE)
+
+
+@pytest.mark.parametrize("formulation", [kidney_ip.optimise_picef, kidney_ip.optimise_picef_matrix])
+def test_highs_matches_gurobi(monkeypatch, formulation):
+    gurobipy = gurobi_backend()
+    use_backend(monkeypatch, gurobipy)
+    gurobi_score = solve(formulation)
+    use_backend(monkeypatch, kidney_highs)
+    assert solve(formulation) == pytest.approx(gurobi_score)
+
+
+def test_highs_model_cannot_be_written():
+    assert not hasattr(kidney_highs.Model(), "write")
@@ -0,0 +1,59 @@
+"""Checks the batch operations of Market against their one-at-a-time versions"""
+
+import numpy as np
+import pytest
+
+from config import ALT_WEIGHT
+from market import Market
+from participant import Participant
+from participant_table import ParticipantTable
+
+BLOOD_TYPES = ['O', 'A', 'B', 'AB']
+
+
+def make_pairs(seed, num_pairs):
+    """
+    :return: num_pairs (recipient, donor) pairs with attributes drawn from a RandomState seeded with seed,
+    stored in a new table, and altruists among them
+    """
+    random_state = np.random.RandomState(seed)
+    table = ParticipantTable()
+    pairs = list()
+    for id_num in range(num_pairs):
+        cpra = random_state.choice([0, random_state.uniform(0, 1)])
+        if id_num % 7 == 6:
+            donor = Participant(id_num, random_state.choice(BLOOD_TYPES), donor=True, recipient=False, altruist=True,
+                                time_to_critical=40, weight=ALT_WEIGHT, cpra=0, dialysis_days=0, table=table)
+            recipient = Participant(id_num, 'X', donor=False, recipient=True, altruist=True, time_to_critical=40,
+                                    weight=ALT_WEIGHT, cpra=0, dialysis_days=0, table=table)
+        else:
+            donor = Participant(id_num, random_state.choice(BLOOD_TYPES), donor=True, recipient=False, altruist=False,
+                                time_to_critical=40, weight=1, cpra=cpra, table=table)
+            recipient = Participant(id_num, random_state.choice(BLOOD_TYPES), donor=False, recipient=True,
+                                    altruist=False, time_to_critical=40, weight=1, cpra=cpra, table=table)
+        pairs.append((recipient, donor))
+    return pairs
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_add_pairs_matches_add_pair(seed):
+    """add_pairs must make the same compatibility draws, in the same order, as add_pair on each pair in turn"""
+    batched = Market(list(), 0, 1, random_state=np.random.RandomState(seed))
+    one_at_a_time = Market(list(), 0, 1, random_state=np.random.RandomState(seed))
+    # each market gets its own copies of the same pairs
+    batched_pairs = make_pairs(seed, 60)
+    pairs = make_pairs(seed, 60)
+    # the second batch is added to a market which already has pairs
+    batched.add_pairs(batched_pairs[:25])
+    batched.add_pairs(batched_pairs[25:])
+    for pair in pairs:
+        one_at_a_time.add_pair(pair)
+
+    batched_adj_list, __, batched_weights, batched_vertices = batched.get_adj_list()
+    adj_list, __, weights, vertices = one_at_a_time.get_adj_list()
+    assert sum(len(recipients) for recipients in adj_list.values()) > 0
+    assert {donor: list(recipients) for donor, recipients in batched_adj_list.items()} == \
+           {donor: list(recipients) for donor, recipients in adj_list.items()}
+    assert batched_weights == weights
+    assert batched_vertices == vertices
+    assert batched.random_state.get_state()[1].tolist() == one_at_a_time.random_state.get_state()[1].tolist()
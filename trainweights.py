@@ -1,6 +1,7 @@
+import logging
 from weights import Weights
 import simulations as s
-from config import NUM_ALTRUISTS, RESULTS_PATH
+from config import NUM_ALTRUISTS, RESULTS_PATH, LOG_LEVEL
 import os
 import numpy as np
 """
@@ -35,4 +36,5 @@ def train_weights():
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=LOG_LEVEL)
     train_weights()